@@ -1,15 +1,25 @@
-import gradio as gr
-import weaviate
-from weaviate.auth import Auth
-from sentence_transformers import SentenceTransformer
-from weaviate.classes.query import MetadataQuery
-from weaviate.collections.classes.filters import Filter
-from typing import List, Dict, Any
+from model_loader import MODEL_WARM_UP, LazyModel, startup_report, startup_timer
+with startup_timer("import gradio"):
+    import gradio as gr
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
+import sys
+import time
+import traceback
+from collections import deque
 from dotenv import load_dotenv
-import pandas as pd
-import re
 from functools import lru_cache
+import numpy as np
+from highlight import get_highlighter, highlight_matching_words
+from languages import vector_weights
+from embedding_cache import EmbeddingCache
+from micro_batch import MicroBatcher
+from result_cache import ResultCache, search_key
+from results_html import format_results_html
+from search_metrics import METRICS, SearchTrace, start_metrics_server
+from verse_store import VERSE_STORE_PATH, VerseStore
+from search_backend import SEARCH_BACKEND, shared_backend
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +29,7 @@ WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
-if not all([WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME]):
+if SEARCH_BACKEND == "weaviate" and not all([WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME]):
     raise ValueError(
         "Missing required environment variables. Please ensure the following are set:\n"
         "WEAVIATE_URL\n"
@@ -27,8 +37,30 @@ if not all([WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME]):
         "COLLECTION_NAME"
     )
 
-# Initialize the model
-model = SentenceTransformer('sentence-transformers/LaBSE')
+# Concurrent searches are encoded together: wait up to ENCODE_MAX_WAIT_MS for up to ENCODE_MAX_BATCH queries
+ENCODE_MAX_BATCH = int(os.getenv("ENCODE_MAX_BATCH", "32"))
+ENCODE_MAX_WAIT_MS = float(os.getenv("ENCODE_MAX_WAIT_MS", "5"))
+# Searches Gradio runs at once; they only hold the event loop between awaits
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "64"))
+
+# The model is loaded on the first cache miss (or by the warm-up at launch), not at import
+model = LazyModel()
+embedding_cache = EmbeddingCache(model)
+encoder = MicroBatcher(embedding_cache.encode, max_batch=ENCODE_MAX_BATCH, max_wait=ENCODE_MAX_WAIT_MS / 1000, name="app-encoder")
+
+# End-to-end latency of the most recent searches, for metrics()
+search_latencies = deque(maxlen=1000)
+searches_in_flight = 0
+
+
+def get_backend():
+    """One long-lived backend (and Weaviate client) shared by all requests, opened on first use."""
+    return shared_backend(SEARCH_BACKEND, WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME)
+
+# Ranked hits per search, and the rendered page per (search, limit, normalize); both are
+# emptied when a new ingestion changes the backend's version.
+result_cache = ResultCache(version=lambda: get_backend().version())
+html_cache = ResultCache(version=lambda: result_cache.version, version_check=0)
 
 # Book mappings
 VULGATE_BOOKS = {
@@ -55,98 +87,157 @@ VULGATE_BOOKS = {
 }
 
 @lru_cache(maxsize=1)
-def load_vulgate_csv():
-    df = pd.read_csv("data/clem_vulgate.csv")
-    # Expect columns: book, chapter, verse, text
-    return df
+def load_verse_store():
+    """The memory-mapped verse store written by main.py, or None if it has not been built."""
+    if not os.path.exists(VERSE_STORE_PATH):
+        return None
+    return VerseStore(VERSE_STORE_PATH)
 
-def highlight_matching_words(text: str, query: str) -> str:
-    if not query.strip():
-        return text
-    query_words = set(re.findall(r'\b\w+\b', query.lower()))
-    if not query_words:
+def with_context(hit: Dict[str, Any], text: str) -> str:
+    """`text` between the previous and next verse of the same chapter, in grey."""
+    store = load_verse_store()
+    if store is None:
         return text
-    partial_pattern = re.compile(r'(' + '|'.join(re.escape(w) for w in query_words) + r')', re.IGNORECASE)
-    tokens = re.findall(r'\w+|\W+', text)
-    highlighted = []
-    for token in tokens:
-        token_lc = token.lower()
-        if token_lc in query_words:
-            highlighted.append(f'<span style="background:yellow">{token}</span>')
-        elif token.strip() and token.isalpha() and any(w in token_lc and w != token_lc for w in query_words):
-            def green_sub(m):
-                return f'<span style="background:lightgreen">{m.group(0)}</span>'
-            highlighted.append(partial_pattern.sub(green_sub, token))
+    parts = []
+    for neighbour in store.context(hit["book"], hit["chapter"], hit["verse"]):
+        if neighbour["verse"] == hit["verse"]:
+            parts.append(text)
         else:
-            highlighted.append(token)
-    return ''.join(highlighted)
+            parts.append(f'<span style="color:#888">{neighbour["text"]}</span>')
+    return " ".join(parts) or text
 
-def find_similar(query: str, books: List[str], limit: int = 50) -> List[Dict[str, Any]]:
+async def find_similar(query: str, books: List[str], limit: int = 50, normalize: bool = False,
+                       hybrid: bool = False, alpha: float = 0.5, offset: int = 0,
+                       context: bool = False, trace: Optional[SearchTrace] = None) -> List[Dict[str, Any]]:
+    # Without a trace from search() the stages are timed but not recorded
+    trace = trace or SearchTrace("gradio", query)
     try:
-        query_vector = model.encode([query])[0]
-        client = weaviate.connect_to_weaviate_cloud(
-            cluster_url=WEAVIATE_URL,
-            auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
-        )
-        try:
-            vulgate = client.collections.get(COLLECTION_NAME)
-            filter_condition = None
-            if books:
-                selected_books = [VULGATE_BOOKS[book] for book in books]
-                filter_condition = Filter.by_property("book").contains_any(selected_books)
-            response = vulgate.query.near_vector(
-                near_vector=query_vector,
-                limit=limit,
-                return_metadata=MetadataQuery(distance=True),
-                filters=filter_condition
-            )
+        key = search_key(query, books, hybrid, alpha)
+        with trace.stage("result_cache"):
+            hits = result_cache.get(key, offset + limit)
+        if hits is not None:
+            hits = hits[offset:]
+        else:
+            with trace.stage("encode"):
+                query_vector = await asyncio.wrap_future(encoder.submit(query))
+            with trace.stage("connect"):
+                # Opening the local index reads it from disk, so keep that off the event loop too
+                backend = await asyncio.to_thread(get_backend)
+                await backend.async_connect()
+            selected_books = [VULGATE_BOOKS[book] for book in books] if books else None
+            # English (or other translated) queries search the matching translation vectors
+            weights = vector_weights(query, backend.languages)
+            with trace.stage("search"):
+                if hybrid:
+                    hits = await backend.async_hybrid_search(query, query_vector, limit=limit, books=selected_books, alpha=alpha, offset=offset, weights=weights)
+                else:
+                    hits = await backend.async_search(query_vector, limit=limit, books=selected_books, offset=offset, weights=weights)
+            # Later pages are fetched by offset and not cached, so memory stays bounded by the first page
+            if offset == 0:
+                result_cache.put(key, hits, limit)
+        with trace.stage("highlight"):
+            highlight = get_highlighter(query, normalize)
             results = []
-            for obj in response.objects:
-                highlighted_text = highlight_matching_words(obj.properties["text"], query)
+            for hit in hits:
+                highlighted_text = highlight(hit["text"])
+                if context:
+                    highlighted_text = with_context(hit, highlighted_text)
                 results.append({
-                    "Reference": f"{obj.properties['book']} {obj.properties['chapter']}:{obj.properties['verse']}",
-                    "Book": obj.properties["book"],
-                    "Chapter": obj.properties["chapter"],
-                    "Verse": obj.properties["verse"],
+                    "Reference": f"{hit['book']} {hit['chapter']}:{hit['verse']}",
+                    "Book": hit["book"],
+                    "Chapter": hit["chapter"],
+                    "Verse": hit["verse"],
                     "Text": highlighted_text,
-                    "RawText": obj.properties["text"],
-                    "Similarity": round(1 - obj.metadata.distance, 3)
+                    "RawText": hit["text"],
+                    "Similarity": round(1 - hit["distance"], 3)
                 })
-            return results
-        finally:
-            client.close()
+        return results
     except Exception as e:
+        # Shown to the user, but also counted in the metrics and logged with its traceback
+        trace.fail(e)
+        print(f"Search for {query!r} failed in stage {trace.error['stage']}:", file=sys.stderr)
+        traceback.print_exc()
         return [{"Error": str(e)}]
 
-def format_results_html(results: List[Dict[str, Any]]) -> str:
-    if not results:
-        return "<div>No results found.</div>"
-    if "Error" in results[0]:
-        return f'<div style="color:red">Error: {results[0]["Error"]}</div>'
-    html = [
-        '<style>td,th{padding:8px;}th{background:#f4f1e9;}tr:nth-child(even){background:#f9f9f9;}tr:hover{background:#e6e2d3;}table{border-radius:8px;overflow:hidden;box-shadow:0 2px 8px #e6e2d3;}td{vertical-align:top;}</style>',
-        '<table style="border-collapse:collapse;width:100%;font-size:1em;">',
-        '<thead><tr>'
-        '<th>Reference</th><th>Text</th><th>Similarity</th><th>Book</th><th>Chapter</th><th>Verse</th>'
-        '</tr></thead><tbody>'
-    ]
-    for r in results:
-        html.append(f'<tr>'
-            f'<td>{r["Reference"]}</td>'
-            f'<td>{r["Text"]}</td>'
-            f'<td>{r["Similarity"]}</td>'
-            f'<td>{r["Book"]}</td>'
-            f'<td>{r["Chapter"]}</td>'
-            f'<td>{r["Verse"]}</td>'
-            f'</tr>')
-    html.append('</tbody></table>')
-    return ''.join(html)
-
-def search(query: str, books: List[str], limit: int) -> str:
+async def search(query: str, books: List[str], limit: int, normalize: bool = False,
+                 hybrid: bool = False, alpha: float = 0.5, offset: int = 0, context: bool = False) -> str:
+    html, _ = await search_results(query, books, limit, normalize, hybrid, alpha, offset, context)
+    return html
+
+async def search_results(query: str, books: List[str], limit: int, normalize: bool = False, hybrid: bool = False,
+                         alpha: float = 0.5, offset: int = 0, context: bool = False) -> Tuple[str, int]:
+    """The rendered page and how many results it holds (0 after an error)."""
+    global searches_in_flight
     if not query.strip():
-        return "<div>Please enter a search query.</div>"
-    results = find_similar(query, books, limit)
-    return format_results_html(results)
+        return "<div>Please enter a search query.</div>", 0
+    searches_in_flight += 1
+    try:
+        with SearchTrace("gradio", query, books=books, limit=limit, offset=offset, hybrid=hybrid,
+                         alpha=alpha, normalize=normalize, context=context) as trace:
+            with trace.stage("version_check"):
+                # The version lookup is a Weaviate round trip every RESULT_CACHE_VERSION_CHECK seconds
+                await asyncio.to_thread(result_cache.check_version)
+                html_cache.check_version()  # follows result_cache.version, no I/O
+            html_key = (search_key(query, books, hybrid, alpha), offset, limit, normalize, context)
+            with trace.stage("html_cache"):
+                page = html_cache.get(html_key)
+            if page is None:
+                results = await find_similar(query, books, limit, normalize, hybrid, alpha, offset, context, trace)
+                with trace.stage("format"):
+                    failed = bool(results) and "Error" in results[0]
+                    page = (format_results_html(results), 0 if failed else len(results))
+                if not failed:
+                    html_cache.put(html_key, page)
+    finally:
+        searches_in_flight -= 1
+    search_latencies.append(trace.total)
+    return page
+
+async def search_page(query: str, books: List[str], limit: int, normalize: bool, hybrid: bool,
+                      alpha: float, context: bool, page: int):
+    """One page of `limit` results, with the page number kept in a gr.State.
+
+    A page shorter than `limit` is the last one, so Next is disabled there.
+    """
+    page = max(int(page), 0)
+    html, count = await search_results(query, books, limit, normalize, hybrid, alpha, offset=page * limit, context=context)
+    if page and "No results found." in html:
+        html = "<div>No more results.</div>"
+    label = ""
+    if count:
+        label = f"Page {page + 1} (results {page * limit + 1}–{page * limit + count})"
+    elif query.strip():
+        label = f"Page {page + 1}"
+    return html, page, label, gr.update(interactive=page > 0), gr.update(interactive=count == limit)
+
+async def first_page(*args):
+    return await search_page(*args, 0)
+
+async def next_page(*args):
+    *args, page = args
+    return await search_page(*args, page + 1)
+
+async def previous_page(*args):
+    *args, page = args
+    return await search_page(*args, page - 1)
+
+def metrics() -> Dict[str, Any]:
+    """Encoder batching, cache, per-stage and latency counters for tuning ENCODE_MAX_BATCH / ENCODE_MAX_WAIT_MS."""
+    latencies = np.asarray(search_latencies) * 1000
+    return {
+        "searches_in_flight": searches_in_flight,
+        "search_latency_ms": {
+            "n": len(latencies),
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        },
+        "stages": METRICS.stage_summary("gradio"),
+        "encoder": encoder.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "html_cache": html_cache.stats(),
+    }
 
 with gr.Blocks(title="Latin Vulgate Verse Similarity Search", theme=gr.themes.Soft()) as demo:
     gr.Markdown("""
@@ -172,25 +263,69 @@ with gr.Blocks(title="Latin Vulgate Verse Similarity Search", theme=gr.themes.So
     with gr.Row():
         limit = gr.Slider(
             minimum=1,
-            maximum=50,
+            maximum=100,
             value=20,
             step=1,
-            label="Number of results"
+            label="Results per page"
+        )
+        normalize = gr.Checkbox(
+            label="Match Latin spelling variants (u/v, i/j, ae/e)",
+            value=False
+        )
+        context = gr.Checkbox(
+            label="Show neighbouring verses",
+            value=False,
+            visible=os.path.exists(VERSE_STORE_PATH)
+        )
+    with gr.Row():
+        hybrid = gr.Checkbox(
+            label="Hybrid search (keywords + meaning)",
+            value=False
+        )
+        alpha = gr.Slider(
+            minimum=0,
+            maximum=1,
+            value=0.5,
+            step=0.05,
+            label="Hybrid balance (0 = keywords only, 1 = meaning only)"
         )
     with gr.Row():
         search_btn = gr.Button("Search", variant="primary")
     output = gr.HTML(label="Results")
+    page = gr.State(0)
+    with gr.Row():
+        prev_btn = gr.Button("◀ Previous", interactive=False)
+        page_info = gr.Markdown()
+        next_btn = gr.Button("Next ▶", interactive=False)
+    with gr.Accordion("Server metrics", open=False):
+        metrics_btn = gr.Button("Refresh")
+        metrics_output = gr.JSON()
 
 
-    search_btn.click(
-        fn=search,
-        inputs=[query, book_select, limit],
-        outputs=output
-    )
-    query.submit(
-        fn=search,
-        inputs=[query, book_select, limit],
-        outputs=output
-    )
+    search_inputs = [query, book_select, limit, normalize, hybrid, alpha, context]
+    page_outputs = [output, page, page_info, prev_btn, next_btn]
+    search_btn.click(fn=first_page, inputs=search_inputs, outputs=page_outputs)
+    query.submit(fn=first_page, inputs=search_inputs, outputs=page_outputs)
+    next_btn.click(fn=next_page, inputs=search_inputs + [page], outputs=page_outputs)
+    prev_btn.click(fn=previous_page, inputs=search_inputs + [page], outputs=page_outputs)
+    metrics_btn.click(fn=metrics, outputs=metrics_output, api_name="metrics")
 if __name__ == "__main__":
-    demo.launch()
+    if MODEL_WARM_UP:
+        # Serve immediately; a search arriving before the warm-up finishes waits for the load
+        model.warm_up_in_background()
+    with startup_timer("open backend"):
+        reachable = get_backend().ping()
+    if not reachable:
+        print("Warning: search backend is not reachable yet; it will be retried on the first search.")
+    print(startup_report())
+    start_metrics_server()
+    demo.queue(default_concurrency_limit=SEARCH_CONCURRENCY).launch(prevent_thread_lock=True)
+    try:
+        while True:
+            time.sleep(0.1)
+    except (KeyboardInterrupt, OSError):
+        print("Keyboard interruption in main thread... closing server.")
+    finally:
+        # The async Weaviate client lives on Gradio's event loop, so close it before the server stops that loop
+        get_backend().close()
+        demo.close()
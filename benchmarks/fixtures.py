@@ -0,0 +1,88 @@
+# Offline stand-ins used by the benchmarks: a fake encoder, synthetic data and a mock Weaviate collection.
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+
+DIM = 768
+BOOKS = ["Gn", "Ex", "Lv", "Nm", "Dt", "Ps", "Pr", "Is", "Jr", "Ez", "Mt", "Mc", "Lc", "Jo", "Act", "Rom", "Apc"]
+WORDS = ("in principio creavit deus caelum et terram autem erat inanis vacua tenebrae super faciem abyssi "
+         "spiritus dei ferebatur aquas dixitque fiat lux facta est vidit quod esset bona divisit a").split()
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer.encode (pseudo-random unit vectors seeded by text)."""
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        out = np.empty((len(texts), DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            v = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+            out[i] = v / np.linalg.norm(v)
+        return out
+
+
+def synthetic_verses(n=35000, seed=0):
+    """A CSV-shaped DataFrame (latin/book/chapter/verse) of `n` fake verses spread over BOOKS."""
+    rng = np.random.default_rng(seed)
+    per_book = -(-n // len(BOOKS))
+    books = np.repeat(BOOKS, per_book)[:n]
+    position = np.arange(n) % per_book
+    lengths = rng.integers(8, 30, n)
+    return pd.DataFrame({
+        "latin": [" ".join(rng.choice(WORDS, k)) for k in lengths],
+        "book": books,
+        "chapter": position // 30 + 1,
+        "verse": position % 30 + 1,
+    })
+
+
+def synthetic_queries(n=200, seed=1):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, k)) for k in rng.integers(4, 20, n)]
+
+
+class _MockBatch:
+    def __init__(self, collection, batch_size):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._flush()
+
+    def _flush(self):
+        if self.pending:
+            time.sleep(self.collection.request_latency)
+            self.pending = 0
+
+    def add_object(self, properties=None, uuid=None, vector=None, **kwargs):
+        self.collection.objects[uuid] = (properties, vector)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self._flush()
+        return uuid
+
+
+class _MockBatchWrapper:
+    def __init__(self, collection):
+        self.collection = collection
+        self.failed_objects = []
+
+    def fixed_size(self, batch_size=100, concurrent_requests=2):
+        return _MockBatch(self.collection, batch_size)
+
+
+class MockCollection:
+    """In-memory stand-in for a Weaviate collection's batch API.
+
+    Each flushed batch sleeps `request_latency` seconds to model a network round trip.
+    """
+
+    def __init__(self, request_latency=0.0):
+        self.request_latency = request_latency
+        self.objects = {}
+        self.batch = _MockBatchWrapper(self)
@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import FakeModel, MockCollection, synthetic_queries, synthetic_verses
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCHMARKS = ["model_load", "encode", "search", "recall", "render", "ingest"]
+# (quantization, pca dims) variants compared against exact search by the recall benchmark
+QUANTIZED_VARIANTS = [("int8", None), ("pca", 256), ("pca", 128)]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def load_model(args):
+    if args.model == "fake":
+        return FakeModel()
+    from model_loader import LazyModel
+    # Load eagerly so bench_model_load measures it; honours MODEL_BACKEND / MODEL_FILE
+    return LazyModel().load()
+
+
+def model(args, ctx):
+    if "model" not in ctx:
+        ctx["model"] = load_model(args)
+    return ctx["model"]
+
+
+def bench_model_load(args, ctx):
+    started = time.perf_counter()
+    ctx["model"] = load_model(args)
+    return {"seconds": time.perf_counter() - started, "model": args.model}
+
+
+def bench_encode(args, ctx):
+    encoder = model(args, ctx)
+    queries = synthetic_queries(args.queries)
+    results = {"single": summarize([t for q in queries for t in timed(lambda: encoder.encode([q]), 1)])}
+    for batch_size in (32, 256):
+        texts = (queries * (batch_size // len(queries) + 1))[:batch_size]
+        seconds = min(timed(lambda: encoder.encode(texts, batch_size=batch_size), 3))
+        results[f"batch_{batch_size}"] = {"sentences_per_s": batch_size / seconds}
+    return results
+
+
+def local_index(args, ctx):
+    """The real local index if it exists (unless --synthetic), else one built from synthetic verses.
+
+    A synthetic index is embedded with the selected --model, which also encodes the queries.
+    """
+    if "backend" in ctx:
+        return ctx["backend"]
+    from search_backend import LOCAL_INDEX_DIR, LocalBackend, build_local_index
+    index_dir = LOCAL_INDEX_DIR
+    if args.synthetic or not os.path.exists(os.path.join(index_dir, "vectors.npy")):
+        index_dir = os.path.join(ctx["tmp"], "index")
+        df = synthetic_verses(args.verses)
+        build_local_index(df, model(args, ctx).encode(df.latin.tolist(), batch_size=256), index_dir)
+    ctx["index_dir"] = index_dir
+    ctx["backend"] = LocalBackend(index_dir)
+    return ctx["backend"]
+
+
+def bench_search(args, ctx):
+    backend = local_index(args, ctx)
+    vectors = model(args, ctx).encode(synthetic_queries(args.queries))
+    books = list(backend.book_ranges)
+    one_book = books[:1]
+    five_books = books[:5]
+    for v in vectors[:10]:  # warm the memory map
+        backend.search(v, limit=20)
+    return {
+        "rows": len(backend),
+        "unfiltered": summarize([t for v in vectors for t in timed(lambda: backend.search(v, limit=20), 1)]),
+        "filter_1_book": summarize([t for v in vectors for t in timed(lambda: backend.search(v, limit=20, books=one_book), 1)]),
+        "filter_5_books": summarize([t for v in vectors for t in timed(lambda: backend.search(v, limit=20, books=five_books), 1)]),
+    }
+
+
+def bench_recall(args, ctx, k=10):
+    """recall@k and latency of each quantized index relative to exact search over the same vectors."""
+    from search_backend import LocalBackend, build_local_index
+    exact = local_index(args, ctx)
+    queries = model(args, ctx).encode(synthetic_queries(args.queries))
+    key = lambda hit: (hit["book"], hit["chapter"], hit["verse"])
+    truth = [{key(h) for h in exact.search(q, limit=k)} for q in queries]
+    df = pd.DataFrame({"latin": exact.store.texts(), "book": exact.store.books(), "chapter": exact.chapters, "verse": exact.verses})
+    results = {"k": k, "exact": {
+        "bytes": exact.vectors.nbytes,
+        "latency": summarize([t for q in queries for t in timed(lambda: exact.search(q, limit=k), 1)]),
+    }}
+    for quantization, dims in QUANTIZED_VARIANTS:
+        name = quantization if dims is None else f"{quantization}_{dims}"
+        index_dir = os.path.join(ctx["tmp"], name)
+        build_local_index(df, exact.vectors, index_dir, quantization, dims or 256)
+        backend = LocalBackend(index_dir)
+        found = [{key(h) for h in backend.search(q, limit=k)} for q in queries]
+        results[name] = {
+            "bytes": backend.coarse.nbytes,
+            f"recall_at_{k}": float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth) if t])),
+            "latency": summarize([t for q in queries for t in timed(lambda: backend.search(q, limit=k), 1)]),
+        }
+    return results
+
+
+def bench_render(args, ctx):
+    from highlight import highlight_matching_words
+    from results_html import format_results_html
+    backend = local_index(args, ctx)
+    queries = synthetic_queries(args.queries)
+    hits = backend.search(model(args, ctx).encode(queries[:1])[0], limit=50)
+
+    def highlight(query):
+        return [highlight_matching_words(h["text"], query) for h in hits]
+
+    def render(query):
+        return format_results_html([{
+            "Reference": f"{h['book']} {h['chapter']}:{h['verse']}",
+            "Book": h["book"],
+            "Chapter": h["chapter"],
+            "Verse": h["verse"],
+            "Text": text,
+            "RawText": h["text"],
+            "Similarity": round(1 - h["distance"], 3),
+        } for h, text in zip(hits, highlight(query))])
+
+    return {
+        "results_per_page": len(hits),
+        "highlight": summarize([t for q in queries for t in timed(lambda: highlight(q), 1)]),
+        "highlight_and_html": summarize([t for q in queries for t in timed(lambda: render(q), 1)]),
+    }
+
+
+def bench_ingest(args, ctx):
+    import main
+    encoder = model(args, ctx)
+    csv_path = os.path.join(ctx["tmp"], "verses.csv")
+    synthetic_verses(args.ingest_verses).to_csv(csv_path, index=False)
+    collection = MockCollection(request_latency=args.upload_latency)
+    state = main.IngestState(os.path.join(ctx["tmp"], "ingest_state.sqlite"))
+    try:
+        started = time.perf_counter()
+        uploaded, stages = main.ingest(csv_path, encoder, collection, state, chunk_size=500)
+        elapsed = time.perf_counter() - started
+    finally:
+        state.close()
+    results = {"verses": uploaded, "seconds": elapsed, "verses_per_s": uploaded / elapsed}
+    for stage in stages:
+        results[stage.name] = {
+            "busy_s": stage.busy,
+            "waiting_s": stage.waiting,
+            "verses_per_s": stage.verses / stage.busy if stage.busy else 0.0,
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(old_path, new_path):
+    """Print every numeric metric of two result files side by side."""
+    with open(old_path) as f:
+        old = flatten(json.load(f)["results"])
+    with open(new_path) as f:
+        new = flatten(json.load(f)["results"])
+    print(f"{'metric':<45} {'old':>12} {'new':>12} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else ""
+        print(f"{key:<45} {old[key]:>12.3f} {new[key]:>12.3f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark encoding, search, rendering and ingestion offline.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--model", choices=["labse", "fake"], help="Encoder: the real LaBSE model or a fake hashing encoder (default: labse)", default="labse")
+    parser.add_argument("--synthetic", action="store_true", help="Search a synthetic index even if the real local index exists")
+    parser.add_argument("--verses", type=int, help="Rows in the synthetic index (default: 35000)", default=35000)
+    parser.add_argument("--queries", type=int, help="Queries per latency measurement (default: 200)", default=200)
+    parser.add_argument("--ingest-verses", type=int, help="Verses ingested into the mock collection (default: 5000)", default=5000)
+    parser.add_argument("--upload-latency", type=float, help="Simulated seconds per mock batch request (default: 0.01)", default=0.01)
+    parser.add_argument("-o", "--output", type=str, help="Results file (default: benchmarks/results/<timestamp>.json)", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    selected = args.benchmarks or BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    results = {}
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = {"tmp": tmp}
+        for name in BENCHMARKS:
+            if name in selected:
+                print(f"Running {name}...", file=sys.stderr)
+                # One failing benchmark must not lose the results of the others
+                try:
+                    results[name] = globals()[f"bench_{name}"](args, ctx)
+                except Exception as e:
+                    traceback.print_exc()
+                    results[name] = {"error": f"{type(e).__name__}: {e}"}
+                    failed.append(name)
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {
+        "meta": {
+            "timestamp": timestamp,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model": args.model,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Wrote {output}", file=sys.stderr)
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+from collections import Counter
+import numpy as np
+from highlight import WORD_RE, normalize_latin
+
+
+def tokenize(text):
+    """Lower-cased word tokens with Latin spelling variants folded (u/v, i/j, ae/e)."""
+    return [normalize_latin(w) for w in WORD_RE.findall(text)]
+
+
+class BM25Index:
+    """Okapi BM25 over the verse texts, stored as compressed-sparse postings.
+
+    Postings for term `t` are `docs[offsets[t]:offsets[t + 1]]` with term
+    frequencies in `tfs`; document ids are row numbers of the local index, so
+    lexical and vector scores can be combined row by row. Everything is plain
+    NumPy arrays, saved to a single uncompressed `.npz` that loads in
+    milliseconds.
+    """
+
+    def __init__(self, terms, offsets, docs, tfs, doc_lens, k1=1.2, b=0.75):
+        self.terms = terms
+        self.term_ids = {t: i for i, t in enumerate(terms.tolist())}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        n = len(doc_lens)
+        df = np.diff(offsets)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # Per-document part of the BM25 denominator, precomputed once.
+        self.norm = (k1 * (1 - b + b * doc_lens / max(doc_lens.mean(), 1e-9))).astype(np.float32)
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    @classmethod
+    def build(cls, texts, **kwargs):
+        vocabulary = {}
+        entries = []
+        doc_lens = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                entries.append((vocabulary.setdefault(term, len(vocabulary)), doc, tf))
+        postings = np.array(entries, dtype=np.int64).reshape(-1, 3)
+        postings = postings[np.lexsort((postings[:, 1], postings[:, 0]))]
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(postings[:, 0], minlength=len(vocabulary)), out=offsets[1:])
+        terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=object)
+        return cls(terms, offsets, postings[:, 1].astype(np.int32), postings[:, 2].astype(np.float32), doc_lens, **kwargs)
+
+    def save(self, path):
+        # Renamed into place, so a running backend never loads half of a rebuild
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                terms=self.terms.astype(str),
+                offsets=self.offsets,
+                docs=self.docs,
+                tfs=self.tfs,
+                doc_lens=self.doc_lens,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        data = np.load(path)
+        return cls(data["terms"], data["offsets"], data["docs"], data["tfs"], data["doc_lens"], **kwargs)
+
+    def scores(self, query):
+        """BM25 score of every document for `query` (float32 array, one entry per row)."""
+        scores = np.zeros(len(self.doc_lens), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.term_ids.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.docs[start:end]
+            tf = self.tfs[start:end]
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 index for an existing local Vulgate index.")
+    parser.add_argument("--index-dir", type=str, help="Local index directory (default: data/vulgate_index)", default="data/vulgate_index")
+    args = parser.parse_args()
+
+    from verse_store import VerseStore
+    verses = VerseStore(os.path.join(args.index_dir, "verses.store"))
+    index = BM25Index.build(verses.texts())
+    index.save(os.path.join(args.index_dir, "bm25.npz"))
+    print(f"Indexed {len(index)} verses, {len(index.terms)} terms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from itertools import islice
+from dotenv import load_dotenv
+from model_loader import LazyModel
+from search_backend import SEARCH_BACKEND, SEARCH_THRESHOLD, open_backend
+
+# A sentence runs up to terminal punctuation plus any closing quotes/brackets,
+# or to a blank line (headings and other unpunctuated paragraphs).
+SENTENCE_END_RE = re.compile(r'[.!?]+["\'”’»)\]]*|\n[^\S\n]*\n')
+# The document is read this many characters at a time
+READ_CHARS = 64 * 1024
+# A run of text with no sentence end this long is cut at a space so a file
+# without punctuation cannot pull the whole document into memory.
+MAX_SENTENCE_CHARS = 100_000
+
+
+def iter_raw_sentences(fh, read_chars=READ_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    """Yield (offset, raw text) for each sentence in fh, reading it in fixed-size chunks.
+
+    The unfinished sentence at the end of a chunk is carried over to the
+    next one, so memory stays bounded by the chunk plus one sentence, and no
+    sentence is cut at a chunk boundary. Offsets count characters as read
+    from fh; open it with newline='' so they match the file with CRLF line
+    endings too.
+    """
+    base = 0  # offset of buf[0] in the document
+    buf = ""
+    while True:
+        chunk = fh.read(read_chars)
+        buf += chunk
+        pos = 0
+        while m := SENTENCE_END_RE.search(buf, pos):
+            # More punctuation, closing quotes or blank lines may follow in the next chunk
+            if chunk and m.end() == len(buf):
+                break
+            yield base + pos, buf[pos:m.end()]
+            pos = m.end()
+        if not chunk:
+            if buf[pos:].strip():
+                yield base + pos, buf[pos:]
+            return
+        while len(buf) - pos > max_chars:
+            cut = buf.rfind(" ", pos + 1, pos + max_chars) + 1 or pos + max_chars
+            yield base + pos, buf[pos:cut]
+            pos = cut
+        buf = buf[pos:]
+        base += pos
+
+
+def iter_sentences(fh, min_chars=10):
+    """Yield sentences with character offsets into the original document."""
+    for base, raw in iter_raw_sentences(fh):
+        text = ' '.join(raw.split())
+        if len(text) < min_chars:
+            continue
+        lead = len(raw) - len(raw.lstrip())
+        trail = len(raw) - len(raw.rstrip())
+        yield {
+            "start": base + lead,
+            "end": base + len(raw) - trail,
+            "sentence": text,
+        }
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+def detect_citations(fh, model, backend, out, batch_size=256, limit=10,
+                     threshold=0.4, min_chars=10, passages=False):
+    """Scan a document for Vulgate citations and write one JSON line per match.
+
+    Sentences are encoded `batch_size` at a time and each batch is searched
+    with one `backend.search_batch` call (concurrent queries for Weaviate, a
+    single matrix product for the local index), so only one batch of
+    sentences and vectors is held in memory at once. With `passages=True`
+    matches are verse spans from `LocalBackend.passage_search_batch`, so a
+    quotation running across verses is reported as one range.
+    Returns (sentences, matches, seconds).
+    """
+    n_sentences = 0
+    n_matches = 0
+    started = time.perf_counter()
+    for batch in batched(iter_sentences(fh, min_chars), batch_size):
+        vectors = model.encode([s["sentence"] for s in batch], batch_size=batch_size)
+        search = backend.passage_search_batch if passages else backend.search_batch
+        hits = search(vectors, limit=limit, distance=threshold)
+        for sent, matches in zip(batch, hits):
+            for m in matches:
+                if m["distance"] >= threshold:
+                    continue
+                out.write(json.dumps({
+                    **sent,
+                    "reference": f"{m['book']} {m['chapter']}:{m['verse']}" + (f"-{m['verse_end']}" if m.get("verse_end", m["verse"]) != m["verse"] else ""),
+                    "book": m["book"],
+                    "chapter": m["chapter"],
+                    "verse": m["verse"],
+                    "verse_end": m.get("verse_end", m["verse"]),
+                    "text": m["text"],
+                    "similarity": round(1 - m["distance"], 3),
+                }, ensure_ascii=False) + "\n")
+                n_matches += 1
+        out.flush()
+        n_sentences += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"{n_sentences} sentences, {n_matches} matches, "
+              f"{n_sentences / elapsed:.1f} sentences/s", file=sys.stderr)
+    return n_sentences, n_matches, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect Vulgate citations in a Latin document.")
+    parser.add_argument("input", type=str, help="Path to a plain-text document, or '-' for stdin")
+    parser.add_argument("-o", "--output", type=str, help="JSONL output path (default: stdout)", default="-")
+    parser.add_argument("--threshold", type=float, help=f"Maximum cosine distance for a match (default: {SEARCH_THRESHOLD})", default=SEARCH_THRESHOLD)
+    parser.add_argument("--limit", type=int, help="Candidates fetched per sentence (default: 10)", default=10)
+    parser.add_argument("--batch-size", type=int, help="Sentences encoded per batch (default: 256)", default=256)
+    parser.add_argument("--workers", type=int, help="Concurrent Weaviate searches (default: 8)", default=8)
+    parser.add_argument("--backend", choices=["weaviate", "local"], help=f"Search backend (default: {SEARCH_BACKEND})", default=SEARCH_BACKEND)
+    parser.add_argument("--min-chars", type=int, help="Skip sentences shorter than this (default: 10)", default=10)
+    parser.add_argument("--passages", action="store_true", help="Match verse spans as well as single verses (local backend only)")
+    args = parser.parse_args()
+    if args.passages and args.backend != "local":
+        parser.error("--passages needs --backend local")
+
+    load_dotenv()
+    WEAVIATE_URL = os.getenv("WEAVIATE_URL")
+    WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
+    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "Vulgate")
+
+    if args.backend == "weaviate" and (not WEAVIATE_URL or not WEAVIATE_API_KEY):
+        print("Error: WEAVIATE_URL and WEAVIATE_API_KEY must be set in your .env file.")
+        exit(1)
+
+    model = LazyModel()
+    backend = open_backend(args.backend, WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME, workers=args.workers)
+    # newline='' keeps CRLF line endings, so offsets count every character of the file
+    if args.input == "-":
+        sys.stdin.reconfigure(newline="")
+        fh = sys.stdin
+    else:
+        fh = open(args.input, encoding="utf-8", newline="")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        n_sentences, n_matches, elapsed = detect_citations(
+            fh, model, backend, out,
+            batch_size=args.batch_size,
+            limit=args.limit,
+            threshold=args.threshold,
+            min_chars=args.min_chars,
+            passages=args.passages,
+        )
+        print(f"Done: {n_sentences} sentences, {n_matches} matches in {elapsed:.1f}s "
+              f"({n_sentences / max(elapsed, 1e-9):.1f} sentences/s)", file=sys.stderr)
+    finally:
+        backend.close()
+        if fh is not sys.stdin:
+            fh.close()
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
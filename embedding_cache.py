@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from model_loader import MODEL_NAME
+
+load_dotenv()
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Rows kept in the SQLite tier; the least recently used are deleted beyond it (about 3 KB each for LaBSE)
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000"))
+
+
+def normalize_query(text):
+    """Canonical form of a query used as the cache key.
+
+    Only Unicode normalization and whitespace are touched: LaBSE is cased, so
+    changing case or punctuation would change the embedding.
+    """
+    return ' '.join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Query embeddings memoized in an in-memory LRU backed by an optional SQLite file.
+
+    The SQLite tier is shared by every process that points at the same path
+    (the Gradio and Streamlit apps and the CLI), so a passage encoded once by
+    any of them is a disk hit for the others. It holds at most `disk_maxsize`
+    rows (None for no limit): each row records when it was last read from
+    or written to disk, and the least recently used rows are deleted after
+    an insert pushes the table past the limit.
+    """
+
+    def __init__(self, model, model_name=None, maxsize=EMBEDDING_CACHE_SIZE, path=EMBEDDING_CACHE_PATH,
+                 disk_maxsize=EMBEDDING_CACHE_DISK_SIZE):
+        self.model = model
+        # A LazyModel knows whether it runs ONNX/quantized weights, which embed slightly differently
+        self.model_name = model_name or getattr(model, "model_id", MODEL_NAME)
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (model, text))"
+            )
+            # Files written before the size limit have no last_used; their rows are evicted first
+            if "last_used" not in [row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")]:
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._db.commit()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key, touched):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return vector
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND text = ?",
+                (self.model_name, key),
+            ).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+                self.disk_hits += 1
+                touched.append(key)
+                return vector
+        return None
+
+    def _evict(self):
+        """Delete the least recently used rows beyond `disk_maxsize`."""
+        if self.disk_maxsize is None:
+            return
+        excess = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.disk_maxsize
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self.disk_evictions += excess
+
+    def encode(self, texts):
+        """Return a (len(texts), dim) float32 array, encoding only cache misses."""
+        keys = [normalize_query(t) for t in texts]
+        vectors = [None] * len(keys)
+        touched = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vectors[i] = self._lookup(key, touched)
+            if touched:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                    [(now, self.model_name, key) for key in touched],
+                )
+                self._db.commit()
+        missing = sorted({key for key, v in zip(keys, vectors) if v is None})
+        if missing:
+            encoded = np.asarray(self.model.encode(missing), dtype=np.float32)
+            new = dict(zip(missing, encoded))
+            with self._lock:
+                self.misses += len(missing)
+                for key, vector in new.items():
+                    self._remember(key, vector)
+                if self._db is not None:
+                    now = time.time()
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                        [(self.model_name, key, vector.tobytes(), now) for key, vector in new.items()],
+                    )
+                    self._evict()
+                    self._db.commit()
+            vectors = [new[key] if v is None else v for key, v in zip(keys, vectors)]
+        return np.stack(vectors)
+
+    def encode_one(self, text):
+        return self.encode([text])[0]
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._memory),
+            "disk_evictions": self.disk_evictions,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
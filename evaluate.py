@@ -0,0 +1,226 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+from dotenv import load_dotenv
+from detect_citations import batched
+from languages import vector_weights
+from model_loader import LazyModel
+from search_backend import SEARCH_BACKEND, SEARCH_THRESHOLD, open_backend
+
+# "Gn 1:1" or a span "1Cor 13:4-7"
+REFERENCE_RE = re.compile(r"^\s*(\S+)\s+(\d+):(\d+)(?:\s*-\s*(\d+))?\s*$")
+DEFAULT_KS = "1,3,5,10"
+DEFAULT_THRESHOLDS = "0.1,0.15,0.2,0.25,0.3,0.35,0.4,0.45,0.5"
+
+
+def parse_reference(reference):
+    """(book, chapter, first verse, last verse), or None for an empty reference (a sentence that quotes nothing)."""
+    if not reference or not reference.strip():
+        return None
+    m = REFERENCE_RE.match(reference)
+    if not m:
+        raise ValueError(f"Cannot parse reference {reference!r}; expected e.g. 'Gn 1:1' or 'Gn 1:1-3'")
+    book, chapter, verse, verse_end = m.groups()
+    return book, int(chapter), int(verse), int(verse_end or verse)
+
+
+def load_labeled(path):
+    """Labeled quotations from a JSONL or CSV file with `query` and `reference` fields."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [{"query": r["query"], "reference": r.get("reference") or "", "expected": parse_reference(r.get("reference"))} for r in rows]
+
+
+def sample_labeled(store, n, seed=0, min_words=4):
+    """`n` quotations cut from random verses of the verse store: a contiguous 50-80% of each verse's words."""
+    rng = np.random.default_rng(seed)
+    examples = []
+    for row in rng.permutation(len(store)):
+        words = store.text(int(row)).split()
+        if len(words) < min_words:
+            continue
+        length = max(min_words, int(len(words) * rng.uniform(0.5, 0.8)))
+        start = int(rng.integers(0, len(words) - length + 1))
+        verse = store.row(int(row))
+        reference = f"{verse['book']} {verse['chapter']}:{verse['verse']}"
+        examples.append({"query": " ".join(words[start:start + length]), "reference": reference, "expected": parse_reference(reference)})
+        if len(examples) == n:
+            break
+    return examples
+
+
+def is_match(hit, expected):
+    """A hit is correct if it is in the expected chapter and its verse span overlaps the expected one."""
+    if expected is None:
+        return False
+    book, chapter, verse, verse_end = expected
+    return (hit["book"] == book and hit["chapter"] == chapter
+            and hit["verse"] <= verse_end and hit.get("verse_end", hit["verse"]) >= verse)
+
+
+def run(examples, model, backend, limit=10, distance=None, batch_size=256, passages=False, language="auto"):
+    """Search every example; returns (hits per example, encode seconds, search seconds).
+
+    Queries of a batch that search the same vectors (see `--language`) go
+    to the backend in one `search_batch` call.
+    """
+    hits = []
+    encode_seconds = search_seconds = 0.0
+    for batch in batched(examples, batch_size):
+        started = time.perf_counter()
+        vectors = model.encode([e["query"] for e in batch], batch_size=batch_size)
+        encode_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        if passages:
+            hits.extend(backend.passage_search_batch(vectors, limit=limit, distance=distance))
+        else:
+            groups = {}
+            for i, example in enumerate(batch):
+                weights = vector_weights(example["query"], backend.languages, language)
+                groups.setdefault(tuple(sorted((weights or {}).items())), []).append(i)
+            batch_hits = [None] * len(batch)
+            for weights, rows in groups.items():
+                for i, found in zip(rows, backend.search_batch(vectors[rows], limit=limit, distance=distance, weights=dict(weights) or None)):
+                    batch_hits[i] = found
+            hits.extend(batch_hits)
+        search_seconds += time.perf_counter() - started
+        print(f"{len(hits)}/{len(examples)} queries", file=sys.stderr)
+    return hits, encode_seconds, search_seconds
+
+
+def score(examples, hits, ks, thresholds):
+    """recall@k and MRR over the positives, and precision/recall of accepting hits under each threshold.
+
+    At threshold t every hit with distance < t is a predicted citation, which
+    is correct if it matches the example's reference; examples without a
+    reference only contribute false positives. `hits_per_query` is how many
+    rows a search with that threshold pushed down would return.
+    """
+    ranks = []  # 1-based rank of the first correct hit, or None, for each positive
+    for example, found in zip(examples, hits):
+        if example["expected"] is not None:
+            ranks.append(next((i for i, h in enumerate(found, 1) if is_match(h, example["expected"])), None))
+    positives = len(ranks)
+    report = {
+        "queries": len(examples),
+        "positives": positives,
+        "negatives": len(examples) - positives,
+        "mrr": sum(1 / r for r in ranks if r) / positives if positives else 0.0,
+        "recall_at_k": {k: sum(1 for r in ranks if r and r <= k) / positives if positives else 0.0 for k in ks},
+        "thresholds": {},
+    }
+    for t in thresholds:
+        predicted = correct = found_queries = 0
+        for example, found in zip(examples, hits):
+            accepted = [h for h in found if h["distance"] < t]
+            matches = sum(1 for h in accepted if is_match(h, example["expected"]))
+            predicted += len(accepted)
+            correct += matches
+            found_queries += matches > 0
+        precision = correct / predicted if predicted else 0.0
+        recall = found_queries / positives if positives else 0.0
+        report["thresholds"][t] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "hits_per_query": predicted / len(examples) if examples else 0.0,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['queries']} queries ({report['positives']} quotations, {report['negatives']} without a reference)")
+    print(f"MRR: {report['mrr']:.3f}")
+    for k, recall in report["recall_at_k"].items():
+        print(f"recall@{k}: {recall:.3f}")
+    print(f"\n{'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>6} {'hits/query':>10}")
+    for t, r in report["thresholds"].items():
+        print(f"{t:>9.2f} {r['precision']:>9.3f} {r['recall']:>7.3f} {r['f1']:>6.3f} {r['hits_per_query']:>10.2f}")
+    best = max(report["thresholds"], key=lambda t: report["thresholds"][t]["f1"], default=None)
+    if best is not None and report["thresholds"][best]["f1"] > 0:
+        print(f"\nBest F1 at threshold {best} (set SEARCH_THRESHOLD={best} to use it by default)")
+    t = report["throughput"]
+    print(f"\n{t['queries_per_s']:.1f} queries/s (encode {t['encode_s']:.1f}s, search {t['search_s']:.1f}s), "
+          f"{t['rows_returned']} rows returned")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recall@k, MRR and precision per similarity threshold on labeled Vulgate quotations.")
+    parser.add_argument("labeled", type=str, nargs="?", help="JSONL or CSV file with `query` and `reference` (e.g. 'Mt 16:24', empty for a non-quotation)")
+    parser.add_argument("--sample", type=int, help="Instead of a labeled file, cut this many quotations from random verses of the verse store", default=None)
+    parser.add_argument("--seed", type=int, help="--sample: random seed (default: 0)", default=0)
+    parser.add_argument("--ks", type=str, help=f"Comma-separated k for recall@k (default: {DEFAULT_KS})", default=DEFAULT_KS)
+    parser.add_argument("--thresholds", type=str, help=f"Comma-separated distance thresholds to score (default: {DEFAULT_THRESHOLDS})", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--limit", type=int, help="Results fetched per query (default: the largest k)", default=None)
+    parser.add_argument("--distance", type=float, help=f"Push this distance cutoff down into the search (e.g. {SEARCH_THRESHOLD}); thresholds above it are not meaningful", default=None)
+    parser.add_argument("--batch-size", type=int, help="Queries encoded and searched per batch (default: 256)", default=256)
+    parser.add_argument("--workers", type=int, help="Concurrent Weaviate searches (default: 8)", default=8)
+    parser.add_argument("--backend", choices=["weaviate", "local"], help=f"Search backend (default: {SEARCH_BACKEND})", default=SEARCH_BACKEND)
+    parser.add_argument("--language", type=str, help="Vectors searched for an index built with translations: auto, all or a language (default: auto)", default="auto")
+    parser.add_argument("--passages", action="store_true", help="Evaluate verse-span search (local backend only)")
+    parser.add_argument("--results", type=str, help="Also write every query's ranked hits, marked correct or not, to this JSONL file", default=None)
+    parser.add_argument("-o", "--output", type=str, help="Write the report as JSON to this file", default=None)
+    args = parser.parse_args()
+    if (args.labeled is None) == (args.sample is None):
+        parser.error("give either a labeled file or --sample N")
+    if args.passages and args.backend != "local":
+        parser.error("--passages needs --backend local")
+    ks = sorted({int(k) for k in args.ks.split(",")})
+    thresholds = sorted({float(t) for t in args.thresholds.split(",")})
+    limit = args.limit or ks[-1]
+
+    load_dotenv()
+    WEAVIATE_URL = os.getenv("WEAVIATE_URL")
+    WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
+    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "Vulgate")
+
+    if args.backend == "weaviate" and (not WEAVIATE_URL or not WEAVIATE_API_KEY):
+        print("Error: WEAVIATE_URL and WEAVIATE_API_KEY must be set in your .env file.")
+        exit(1)
+
+    if args.sample:
+        from verse_store import VERSE_STORE_PATH, VerseStore
+        examples = sample_labeled(VerseStore(VERSE_STORE_PATH), args.sample, args.seed)
+    else:
+        examples = load_labeled(args.labeled)
+
+    model = LazyModel()
+    backend = open_backend(args.backend, WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME, workers=args.workers)
+    try:
+        started = time.perf_counter()
+        hits, encode_seconds, search_seconds = run(examples, model, backend, limit, args.distance, args.batch_size, args.passages, args.language)
+        elapsed = time.perf_counter() - started
+    finally:
+        backend.close()
+
+    report = score(examples, hits, ks, thresholds)
+    report["throughput"] = {
+        "queries_per_s": len(examples) / elapsed if elapsed else 0.0,
+        "encode_s": encode_seconds,
+        "search_s": search_seconds,
+        "rows_returned": sum(len(h) for h in hits),
+    }
+    report["settings"] = {"backend": args.backend, "limit": limit, "distance": args.distance, "passages": args.passages, "language": args.language}
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for example, found in zip(examples, hits):
+                f.write(json.dumps({
+                    "query": example["query"],
+                    "reference": example["reference"],
+                    "hits": [{**h, "rank": i, "correct": is_match(h, example["expected"])} for i, h in enumerate(found, 1)],
+                }, ensure_ascii=False, default=str) + "\n")
+
+if __name__ == "__main__":
+    main()
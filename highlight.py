@@ -0,0 +1,68 @@
+import re
+from functools import lru_cache
+
+WORD_RE = re.compile(r'\w+')
+EXACT_STYLE = 'background:yellow'
+PARTIAL_STYLE = 'background:lightgreen'
+
+# Orthographic variants treated as equal when normalizing Latin spelling.
+_LATIN_FOLD = str.maketrans({"v": "u", "j": "i", "æ": "e", "œ": "e"})
+_LATIN_DIGRAPHS = re.compile(r'ae|oe')
+# Regex fragment matching every spelling of a normalized letter.
+_LATIN_VARIANTS = {"u": "[uv]", "i": "[ij]", "e": "(?:ae|oe|æ|œ|e)"}
+
+
+def normalize_latin(word):
+    """Fold u/v, i/j and ae/oe/æ/œ → e so spelling variants compare equal."""
+    return _LATIN_DIGRAPHS.sub("e", word.lower().translate(_LATIN_FOLD))
+
+
+class Highlighter:
+    """Query words compiled once, then applied to any number of verses.
+
+    Each verse is scanned in a single pass over its word tokens: a token equal
+    to a query word is wrapped in a yellow span, and any query word occurring
+    inside a longer alphabetic token is wrapped in green. With
+    `normalize=True` both comparisons ignore Latin spelling variants.
+    """
+
+    def __init__(self, query, normalize=False):
+        self.normalize = normalize
+        fold = normalize_latin if normalize else str.lower
+        words = {fold(w) for w in WORD_RE.findall(query)}
+        self.words = frozenset(words)
+        self.fold = fold
+        self.partial = None
+        if words:
+            # Longest first so the alternation prefers the longest match at a position.
+            alternatives = [self._pattern(w) for w in sorted(words, key=len, reverse=True)]
+            self.partial = re.compile('|'.join(alternatives), re.IGNORECASE)
+
+    def _pattern(self, word):
+        if not self.normalize:
+            return re.escape(word)
+        return ''.join(_LATIN_VARIANTS.get(c, re.escape(c)) for c in word)
+
+    def _mark(self, m):
+        token = m.group(0)
+        if self.fold(token) in self.words:
+            return f'<span style="{EXACT_STYLE}">{token}</span>'
+        if token.isalpha() and self.partial.search(token):
+            return self.partial.sub(lambda p: f'<span style="{PARTIAL_STYLE}">{p.group(0)}</span>', token)
+        return token
+
+    def __call__(self, text):
+        if not self.words:
+            return text
+        return WORD_RE.sub(self._mark, text)
+
+
+@lru_cache(maxsize=256)
+def get_highlighter(query, normalize=False):
+    return Highlighter(query, normalize)
+
+
+def highlight_matching_words(text: str, query: str, normalize: bool = False) -> str:
+    if not query.strip():
+        return text
+    return get_highlighter(query, normalize)(text)
@@ -0,0 +1,69 @@
+import re
+
+# Name of the vector embedded from the CSV's `latin` column; translations are named after their language
+PRIMARY_LANGUAGE = "latin"
+
+# Frequent function words; a word listed for more than one language is ignored (see below)
+_STOPWORDS = {
+    "latin": """et est non qui quae quod ad cum ut sed enim autem ex eius eum ego tu nos vos quia erat sunt
+        esse hoc ille illa nec vel aut atque etiam ab pro sub tibi mihi suum meus tuus dixit dicit omnis omnes
+        super sicut ecce ergo ideo vero quoniam propter filius filii dominus deus domini dei ait eorum illis""",
+    "english": """the and of to that is was he his shall unto thou thee thy ye for not be with which who they them
+        him lord god said my will have all from this are were hath upon her their there when what your you""",
+    "german": """der die das und ist nicht zu den von mit sich des auf für dem ein eine auch es an er sie wird
+        wie wir ihr ich mein dein herr gott sprach aber denn doch""",
+    "french": """le la les et est de des du que qui dans pour pas sur au aux ce il elle ils vous nous je mon ton
+        son seigneur dieu dit une un mais car avec""",
+    "italian": """il la le e di che è per una un del della dei non con sono come ma suo sua mio tuo signore dio
+        disse gli nel nella questo""",
+    "spanish": """el la los las y de que en es un una por con para su sus mi tu señor dios dijo pero como del al
+        este esta""",
+}
+_counts = {}
+for _words in _STOPWORDS.values():
+    for _word in set(_words.split()):
+        _counts[_word] = _counts.get(_word, 0) + 1
+STOPWORDS = {language: {w for w in words.split() if _counts[w] == 1} for language, words in _STOPWORDS.items()}
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def detect_language(text, candidates=None):
+    """The language whose function words occur most often in `text`, or None if there are none or it is a tie.
+
+    Short Latin phrases often contain no function word at all; callers then
+    fall back to the Latin vector (see `vector_weights`).
+    """
+    words = WORD_RE.findall(text.lower())
+    scores = {
+        language: sum(1 for w in words if w in stopwords)
+        for language, stopwords in STOPWORDS.items()
+        if candidates is None or language in candidates
+    }
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    if not ranked or ranked[0][1] == 0 or (len(ranked) > 1 and ranked[1][1] == ranked[0][1]):
+        return None
+    return ranked[0][0]
+
+
+def vector_weights(query, languages, language="auto"):
+    """Weight of each named vector for `query`, or None to search the Latin vector only.
+
+    `languages` are the vectors the index has. With `language="auto"` the
+    query's detected language is searched alone when the index has it;
+    otherwise (an undetected or unindexed language) the Latin vector is, as
+    in an index without translations. `language="all"` fuses all vectors
+    with equal weights, and a language name forces that vector.
+    """
+    languages = list(languages)
+    if len(languages) <= 1:
+        return None
+    if language == "all":
+        return {name: 1 / len(languages) for name in languages}
+    if language != "auto":
+        if language not in languages:
+            raise ValueError(f"The index has no {language!r} vectors (available: {', '.join(languages)})")
+        return None if language == PRIMARY_LANGUAGE else {language: 1.0}
+    detected = detect_language(query)
+    if detected != PRIMARY_LANGUAGE and detected in languages:
+        return {detected: 1.0}
+    return None
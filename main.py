@@ -1,71 +1,513 @@
+import argparse
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
 import pandas as pd
-from sentence_transformers import SentenceTransformer
+import numpy as np
 import weaviate
 from weaviate.classes.init import Auth
 import weaviate.classes as wvc
+from weaviate.util import generate_uuid5
 from tqdm import tqdm
 import os
 from dotenv import load_dotenv
+from languages import PRIMARY_LANGUAGE
+from model_loader import MODEL_ID, LazyModel
+from passages import build_passage_index, passage_index_is_current
+from search_backend import INGEST_VERSION_PREFIX, LOCAL_INDEX_DIR, QUANTIZATIONS, build_local_index
+from verse_store import VERSE_STORE_PATH, VerseStore
 load_dotenv()
 
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 COLLECTION_NAME = "Vulgate"
+CSV_PATH = "data/clem_vulgate.csv"
+STATE_PATH = "data/ingest_state.sqlite"
 
 
-df = pd.read_csv("data/clem_vulgate.csv")
-model = SentenceTransformer('sentence-transformers/LaBSE')
-embeddings = model.encode(df.latin.tolist())
-df["embedding"] = list(embeddings)
-df.to_parquet("data/clem_vulgate_vectors.parquet")
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=WEAVIATE_URL,
-    auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
-)
-
-if client.collections.exists(COLLECTION_NAME):  # In case we've created this collection before
-    client.collections.delete(COLLECTION_NAME)  # THIS WILL DELETE ALL DATA IN THE COLLECTION
-
-vulgate = client.collections.create(
-    name=COLLECTION_NAME,
-    properties=[
-        wvc.config.Property(
-            name="text",
-            data_type=wvc.config.DataType.TEXT
-        ),
-        wvc.config.Property(
-            name="book",
-            data_type=wvc.config.DataType.TEXT
-        ),
-        wvc.config.Property(
-            name="chapter",
-            data_type=wvc.config.DataType.INT
-        ),
-        wvc.config.Property(
-            name="verse",
-            data_type=wvc.config.DataType.INT
-        ),
-    ]
-)
-
-# Prepare all the data rows first
-data_rows = []
-for _, row in tqdm(df.iterrows(), total=len(df), desc="Preparing data"):
-    data_rows.append({
-        "properties": {
-            "text": row['latin'],
-            "book": row['book'],
-            "chapter": int(row['chapter']),
-            "verse": int(row['verse'])
-        },
-        "vector": row['embedding']
-    })
-
-# Now perform the batch insertion
-with vulgate.batch.dynamic() as batch:
-    for data_row in tqdm(data_rows, desc="Inserting data"):
-        batch.add_object(
-            properties=data_row['properties'],
-            vector=data_row['vector']
-        )
\ No newline at end of file
+def verse_uuid(book, chapter, verse):
+    """Deterministic object id, so re-inserting a verse overwrites it."""
+    return generate_uuid5(f"{book}:{int(chapter)}:{int(verse)}", COLLECTION_NAME)
+
+
+def text_hash(text, translations=()):
+    """Hash of everything a verse's vectors are computed from; any change re-embeds the verse."""
+    return hashlib.sha1("\0".join([MODEL_ID, text, *translations]).encode("utf-8")).hexdigest()
+
+
+def parse_translations(specs):
+    """{language: CSV column} from "english" or "english=douay_rheims" items."""
+    translations = {}
+    for spec in specs:
+        language, _, column = spec.partition("=")
+        if language in (PRIMARY_LANGUAGE, "text", "book", "chapter", "verse"):
+            raise ValueError(f"{language!r} cannot be used as a translation name")
+        translations[language] = column or language
+    return translations
+
+
+class IngestState:
+    """What has been uploaded so far, kept in SQLite next to the data.
+
+    `verses` holds the text hash and embedding of every uploaded verse, so a
+    re-run only re-embeds verses whose text changed, and `checkpoint` holds
+    the number of CSV rows fully processed by an interrupted run, and
+    `dirty` whether verses were written since the last version was published.
+    `local_only` marks a state updated by `--local-only` runs, whose verses
+    were never uploaded to Weaviate.
+    `translations` holds the text and embedding of each verse in every
+    extra language. The connection is shared by the encoder and uploader
+    threads under a lock.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS verses ("
+            "uuid TEXT PRIMARY KEY, row INTEGER NOT NULL, book TEXT NOT NULL, "
+            "chapter INTEGER NOT NULL, verse INTEGER NOT NULL, text TEXT NOT NULL, "
+            "hash TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "uuid TEXT NOT NULL, language TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (uuid, language))"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+    def reset(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM verses")
+            self.db.execute("DELETE FROM translations")
+            self.db.execute("DELETE FROM meta")
+
+    @property
+    def checkpoint(self):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'checkpoint'").fetchone()
+        return int(row[0]) if row else 0
+
+    def hashes(self, uuids):
+        placeholders = ",".join("?" * len(uuids))
+        with self.lock:
+            return dict(self.db.execute(f"SELECT uuid, hash FROM verses WHERE uuid IN ({placeholders})", uuids))
+
+    def save_chunk(self, rows, checkpoint, translation_rows=()):
+        """Record uploaded rows and advance the checkpoint in one transaction."""
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO verses (uuid, row, book, chapter, verse, text, hash, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO translations (uuid, language, text, vector) VALUES (?, ?, ?, ?)",
+                translation_rows,
+            )
+            if rows:
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dirty', '1')")
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('checkpoint', ?)", (str(checkpoint),))
+
+    def finish(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM meta WHERE key = 'checkpoint'")
+
+    @property
+    def version(self):
+        """Identifier of the last ingestion that changed the collection, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+
+    @version.setter
+    def version(self, version):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+
+    @property
+    def dirty(self):
+        """Whether verses were written since the last `mark_clean()`, by this run or an interrupted one."""
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM meta WHERE key = 'dirty'").fetchone() is not None
+
+    def mark_clean(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM meta WHERE key = 'dirty'")
+
+    @property
+    def local_only(self):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM meta WHERE key = 'local_only'").fetchone() is not None
+
+    @local_only.setter
+    def local_only(self, local_only):
+        with self.lock, self.db:
+            if local_only:
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('local_only', '1')")
+            else:
+                self.db.execute("DELETE FROM meta WHERE key = 'local_only'")
+
+    def export(self, languages=()):
+        """Return (DataFrame, embeddings, {language: embeddings}) for every recorded verse in CSV order.
+
+        The DataFrame has a column of text per language in `languages`.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT uuid, book, chapter, verse, text, vector FROM verses ORDER BY row").fetchall()
+            translated = {
+                language: dict((uuid, (text, vector)) for uuid, text, vector in self.db.execute(
+                    "SELECT uuid, text, vector FROM translations WHERE language = ?", (language,)))
+                for language in languages
+            }
+        df = pd.DataFrame([r[1:5] for r in rows], columns=["book", "chapter", "verse", "latin"])
+        embeddings = np.stack([np.frombuffer(r[5], dtype=np.float32) for r in rows])
+        translations = {}
+        for language, by_uuid in translated.items():
+            df[language] = [by_uuid[r[0]][0] for r in rows]
+            translations[language] = np.stack([np.frombuffer(by_uuid[r[0]][1], dtype=np.float32) for r in rows])
+        return df, embeddings, translations
+
+    def close(self):
+        self.db.close()
+
+
+def vector_index_config(compression):
+    """HNSW config with Weaviate's built-in PQ/BQ/SQ compression (rescored with full vectors at query time)."""
+    quantizers = {
+        "pq": wvc.config.Configure.VectorIndex.Quantizer.pq,
+        "bq": wvc.config.Configure.VectorIndex.Quantizer.bq,
+        "sq": wvc.config.Configure.VectorIndex.Quantizer.sq,
+    }
+    if compression == "none":
+        return None
+    return wvc.config.Configure.VectorIndex.hnsw(quantizer=quantizers[compression]())
+
+
+def create_collection(client, name, compression="none", translations=()):
+    """Create the collection; with `translations` it has one named vector (and text property) per language."""
+    if translations:
+        vectors = {"vectorizer_config": [
+            wvc.config.Configure.NamedVectors.none(name=language, vector_index_config=vector_index_config(compression))
+            for language in [PRIMARY_LANGUAGE, *translations]
+        ]}
+    else:
+        vectors = {"vector_index_config": vector_index_config(compression)}
+    return client.collections.create(
+        name=name,
+        **vectors,
+        properties=[
+            wvc.config.Property(
+                name="text",
+                data_type=wvc.config.DataType.TEXT
+            ),
+            wvc.config.Property(
+                name="book",
+                data_type=wvc.config.DataType.TEXT
+            ),
+            wvc.config.Property(
+                name="chapter",
+                data_type=wvc.config.DataType.INT
+            ),
+            wvc.config.Property(
+                name="verse",
+                data_type=wvc.config.DataType.INT
+            ),
+            *[wvc.config.Property(name=language, data_type=wvc.config.DataType.TEXT) for language in translations],
+        ]
+    )
+
+
+def named_vectors(vulgate):
+    """Names of the collection's named vectors; empty for a collection with a single unnamed vector."""
+    return list(vulgate.config.get().vector_config or {})
+
+
+class StageStats:
+    """Verses handled and seconds spent busy in one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.verses = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+
+    def __str__(self):
+        rate = self.verses / self.busy if self.busy else 0.0
+        return (f"{self.name:>6}: {self.verses} verses in {self.busy:.1f}s busy "
+                f"({rate:.1f} verses/s), {self.waiting:.1f}s waiting on the queue")
+
+
+def iter_changed_chunks(csv_path, state, chunk_size, translations=None):
+    """Yield (chunk, changed row positions, uuids, hashes, checkpoint) for each CSV chunk past the checkpoint."""
+    columns = list((translations or {}).values())
+    start = state.checkpoint
+    if start:
+        print(f"Resuming after row {start}")
+    offset = 0
+    with pd.read_csv(csv_path, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            chunk_start, offset = offset, offset + len(chunk)
+            if offset <= start:
+                continue
+            chunk = chunk.iloc[max(start - chunk_start, 0):]
+            uuids = [verse_uuid(b, c, v) for b, c, v in zip(chunk.book, chunk.chapter, chunk.verse)]
+            texts = chunk[["latin", *columns]].fillna("").astype(str).itertuples(index=False)
+            hashes = [text_hash(t[0], t[1:]) for t in texts]
+            known = state.hashes(uuids)
+            changed = [i for i, (u, h) in enumerate(zip(uuids, hashes)) if known.get(u) != h]
+            yield chunk, changed, uuids, hashes, offset
+
+
+def upload_chunk(vulgate, state, chunk, changed, uuids, hashes, embeddings, checkpoint, batch_size,
+                 translations=None, named=False):
+    """Upsert the changed rows of one chunk, then record them and the checkpoint.
+
+    `embeddings` maps each language to the vectors of the changed rows;
+    `named` uploads them as named vectors. Without `vulgate` the rows are
+    only recorded.
+    """
+    translations = translations or {}
+    rows = chunk.iloc[changed]
+    texts = {language: rows[column].fillna("").astype(str).tolist() for language, column in translations.items()}
+    if changed and vulgate is not None:
+        with vulgate.batch.fixed_size(batch_size=batch_size) as batch:
+            for j, (i, row) in enumerate(zip(changed, rows.itertuples(index=False))):
+                vector = embeddings[PRIMARY_LANGUAGE][j].tolist()
+                if named:
+                    vector = {language: embeddings[language][j].tolist() for language in embeddings}
+                batch.add_object(
+                    properties={
+                        "text": row.latin,
+                        "book": row.book,
+                        "chapter": int(row.chapter),
+                        "verse": int(row.verse),
+                        **{language: texts[language][j] for language in translations},
+                    },
+                    uuid=uuids[i],
+                    vector=vector
+                )
+        if vulgate.batch.failed_objects:
+            raise RuntimeError(
+                f"{len(vulgate.batch.failed_objects)} objects failed to upload, first error: "
+                f"{vulgate.batch.failed_objects[0].message}"
+            )
+    state.save_chunk([
+        (uuids[i], int(row.Index), row.book, int(row.chapter), int(row.verse),
+         row.latin, hashes[i], np.asarray(vector, dtype=np.float32).tobytes())
+        for i, row, vector in zip(changed, rows.itertuples(), embeddings[PRIMARY_LANGUAGE])
+    ], checkpoint, [
+        (uuids[i], language, texts[language][j], np.asarray(embeddings[language][j], dtype=np.float32).tobytes())
+        for language in translations
+        for j, i in enumerate(changed)
+    ])
+
+
+def ingest(csv_path, model, vulgate, state, chunk_size=1000, batch_size=100,
+           encode_batch_size=64, encode_workers=1, queue_size=4, translations=None, named=False):
+    """Stream the CSV in chunks, embedding and upserting only new or changed verses.
+
+    Encoding (on `encode_workers` processes when > 1) runs on the calling
+    thread and feeds a queue of at most `queue_size` encoded chunks that an
+    uploader thread drains into Weaviate, so encoding and upload overlap and
+    a slow upload applies backpressure to the encoder. Chunks are uploaded
+    and checkpointed in order, so a crashed run resumes from the last
+    completed chunk. `translations` ({language: CSV column}) are embedded
+    too and uploaded as named vectors when `named`. With `vulgate=None`
+    nothing is uploaded and the verses are only recorded in `state`.
+    Returns (verses uploaded, per-stage StageStats).
+    """
+    translations = translations or {}
+    chunks = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    encode_stats = StageStats("encode")
+    upload_stats = StageStats("upload")
+    progress = tqdm(desc="Ingesting", unit="verse")
+
+    def uploader():
+        try:
+            while True:
+                waited = time.perf_counter()
+                item = chunks.get()
+                upload_stats.waiting += time.perf_counter() - waited
+                if item is None:
+                    return
+                started = time.perf_counter()
+                upload_chunk(vulgate, state, *item, batch_size=batch_size, translations=translations, named=named)
+                upload_stats.busy += time.perf_counter() - started
+                upload_stats.verses += len(item[1])
+                progress.update(len(item[0]))
+                progress.set_postfix(uploaded=upload_stats.verses)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    pool = model.start_multi_process_pool(["cpu"] * encode_workers) if encode_workers > 1 else None
+    thread = threading.Thread(target=uploader, name="weaviate-uploader", daemon=True)
+    thread.start()
+    try:
+        for chunk, changed, uuids, hashes, checkpoint in iter_changed_chunks(csv_path, state, chunk_size, translations):
+            started = time.perf_counter()
+            texts = {PRIMARY_LANGUAGE: chunk.latin.iloc[changed].tolist()}
+            for language, column in translations.items():
+                texts[language] = chunk[column].iloc[changed].fillna("").astype(str).tolist()
+            embeddings = {}
+            for language, language_texts in texts.items():
+                if not language_texts:
+                    embeddings[language] = []
+                elif pool is not None:
+                    embeddings[language] = model.encode_multi_process(language_texts, pool, batch_size=encode_batch_size)
+                else:
+                    embeddings[language] = model.encode(language_texts, batch_size=encode_batch_size)
+            encode_stats.busy += time.perf_counter() - started
+            encode_stats.verses += len(texts[PRIMARY_LANGUAGE])
+            waited = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    chunks.put((chunk, changed, uuids, hashes, embeddings, checkpoint), timeout=1)
+                    break
+                except queue.Full:
+                    pass
+            encode_stats.waiting += time.perf_counter() - waited
+            if stop.is_set():
+                break
+    finally:
+        if not stop.is_set():
+            chunks.put(None)
+        thread.join()
+        progress.close()
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    if errors:
+        raise errors[0]
+    state.finish()
+    return upload_stats.verses, [encode_stats, upload_stats]
+
+
+def open_collection(client, state, translations, recreate=False, compression="none"):
+    """The Vulgate collection, created (and the state reset) if missing or if `recreate`."""
+    if recreate and client.collections.exists(COLLECTION_NAME):
+        client.collections.delete(COLLECTION_NAME)  # THIS WILL DELETE ALL DATA IN THE COLLECTION
+        state.reset()
+    if not client.collections.exists(COLLECTION_NAME):
+        state.reset()
+        return create_collection(client, COLLECTION_NAME, compression, list(translations))
+    vulgate = client.collections.get(COLLECTION_NAME)
+    if compression != "none":
+        print("Warning: --weaviate-compression only applies when the collection is created; use --recreate to change it.")
+    existing = named_vectors(vulgate)
+    wanted = [PRIMARY_LANGUAGE, *translations] if translations else []
+    if sorted(existing) != sorted(wanted):
+        print(f"Error: the collection has vectors {existing or ['(unnamed)']} but this run needs {wanted or ['(unnamed)']}; "
+              "pass the same --translations as when it was created, or --recreate.")
+        exit(1)
+    return vulgate
+
+
+def publish_version(state, vulgate=None):
+    """Give the ingestion a new version if any verse changed, and write it to the collection description (if any).
+
+    Verses upserted by an interrupted run count too, although the resumed
+    run finds them unchanged; the flag is only cleared once the description
+    is updated. A new version tells the apps' result caches that their
+    cached rankings are stale.
+    """
+    if state.version is None or state.dirty:
+        state.version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        if vulgate is not None:
+            vulgate.config.update(description=f"{INGEST_VERSION_PREFIX}{state.version}")
+        state.mark_clean()
+        print(f"Ingestion version {state.version}")
+    return state.version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the Vulgate and upload it to Weaviate.")
+    parser.add_argument("--csv", type=str, help=f"Input CSV (default: {CSV_PATH})", default=CSV_PATH)
+    parser.add_argument("--chunk-size", type=int, help="CSV rows read, embedded and uploaded per chunk (default: 1000)", default=1000)
+    parser.add_argument("--batch-size", type=int, help="Objects per Weaviate batch request (default: 100)", default=100)
+    parser.add_argument("--encode-batch-size", type=int, help="Verses per model.encode batch (default: 64)", default=64)
+    parser.add_argument("--encode-workers", type=int, help="Embedding processes; >1 uses a SentenceTransformer multi-process pool (default: 1)", default=1)
+    parser.add_argument("--queue-size", type=int, help="Encoded chunks buffered ahead of the uploader (default: 4)", default=4)
+    parser.add_argument("--state", type=str, help=f"Ingestion state database (default: {STATE_PATH})", default=STATE_PATH)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, help="Compact local-index matrix: int8 or PCA-reduced, rescored with full vectors (default: none)", default="none")
+    parser.add_argument("--pca-dims", type=int, help="Dimensions kept by --quantization pca (default: 256)", default=256)
+    parser.add_argument("--weaviate-compression", choices=["none", "pq", "bq", "sq"], help="Vector compression for a newly created collection (default: none)", default="none")
+    parser.add_argument("--recreate", action="store_true", help="Delete and recreate the collection, re-embedding every verse")
+    parser.add_argument("--translations", nargs="+", metavar="LANGUAGE[=COLUMN]", help="Also embed these CSV columns (e.g. english=douay_rheims) as named vectors for cross-lingual queries; needs a new collection", default=[])
+    parser.add_argument("--passage-windows", type=str, help="Comma-separated passage lengths (in verses) embedded for span search, or 'none' (default: 2,3,4,5)", default="2,3,4,5")
+    parser.add_argument("--local-only", action="store_true", help="Skip Weaviate: only build the verse store, local index and passages (no credentials needed)")
+    args = parser.parse_args()
+    if args.local_only and args.recreate:
+        parser.error("--recreate deletes the Weaviate collection and cannot be combined with --local-only")
+    passage_windows = [] if args.passage_windows == "none" else sorted({int(w) for w in args.passage_windows.split(",")})
+    try:
+        translations = parse_translations(args.translations)
+    except ValueError as e:
+        parser.error(str(e))
+
+    model = LazyModel()
+    state = IngestState(args.state)
+    client = None
+    if args.local_only:
+        # The state then records verses Weaviate never got; a later upload run starts over (see below)
+        state.local_only = True
+    else:
+        if not WEAVIATE_URL or not WEAVIATE_API_KEY:
+            print("Error: WEAVIATE_URL and WEAVIATE_API_KEY must be set in your .env file, or pass --local-only.")
+            exit(1)
+        client = weaviate.connect_to_weaviate_cloud(
+            cluster_url=WEAVIATE_URL,
+            auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
+        )
+    try:
+        vulgate = None
+        if client is not None:
+            if state.local_only:
+                print("The ingestion state was updated by --local-only runs; uploading every verse.")
+                state.reset()
+            vulgate = open_collection(client, state, translations, args.recreate, args.weaviate_compression)
+
+        started = time.perf_counter()
+        uploaded, stats = ingest(
+            args.csv, model, vulgate, state,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            encode_batch_size=args.encode_batch_size,
+            encode_workers=args.encode_workers,
+            queue_size=args.queue_size,
+            translations=translations,
+            named=bool(translations),
+        )
+        elapsed = time.perf_counter() - started
+        print(f"{'Embedded' if client is None else 'Uploaded'} {uploaded} new or changed verses in {elapsed:.1f}s "
+              f"({uploaded / max(elapsed, 1e-9):.1f} verses/s end to end)")
+        for stage in stats:
+            print(stage)
+
+        publish_version(state, vulgate)
+
+        df, embeddings, translated = state.export(list(translations))
+        VerseStore.build(VERSE_STORE_PATH, df["book"], df["chapter"], df["verse"], df["latin"], embeddings, version=state.version,
+                         translations={language: (df[language].fillna("").astype(str).tolist(), translated[language]) for language in translated})
+        build_local_index(df, embeddings, quantization=args.quantization, dims=args.pca_dims, version=state.version,
+                          translations=translated)
+        # Passages only change with the verses, so an ingestion that changed nothing keeps the existing index
+        if passage_windows and passage_index_is_current(LOCAL_INDEX_DIR, state.version, passage_windows):
+            print("Passage index is up to date")
+        elif passage_windows:
+            passages = build_passage_index(LOCAL_INDEX_DIR, model, passage_windows)
+            print(f"Indexed {len(passages.centroids)} chapters and {len(passages)} passages")
+    finally:
+        if client is not None:
+            client.close()
+        state.close()
+
+if __name__ == "__main__":
+    main()
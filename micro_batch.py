@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched call.
+
+    `submit(item)` queues the item and returns a Future. A worker thread takes
+    the first waiting item, keeps collecting for up to `max_wait` seconds or
+    until `max_batch` items are queued, then calls `fn(items)` once and hands
+    result `i` to the i-th caller. Used to share one `model.encode` call
+    between queries that arrive at the same time.
+    """
+
+    def __init__(self, fn, max_batch=64, max_wait=0.005, name="micro-batcher"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            finished = time.perf_counter()
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.wait_seconds += sum(started - queued for _, _, queued in batch)
+            self.run_seconds += finished - started
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "mean_wait_ms": self.wait_seconds / self.items * 1000 if self.items else 0.0,
+            "mean_batch_ms": self.run_seconds / self.batches * 1000 if self.batches else 0.0,
+        }
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
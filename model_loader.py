@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_NAME = 'sentence-transformers/LaBSE'
+# "torch" (default), "onnx" or "openvino"; the latter two need sentence-transformers >= 3.2
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "torch")
+# Pre-exported model file inside the model repo or directory, e.g. onnx/model_qint8_avx512.onnx
+MODEL_FILE = os.getenv("MODEL_FILE")
+MODEL_WARM_UP = os.getenv("MODEL_WARM_UP", "0") == "1"
+
+# (stage, seconds) in the order the stages finished, for startup_report()
+STARTUP_TIMINGS = []
+_started = time.perf_counter()
+
+
+@contextmanager
+def startup_timer(stage):
+    """Record how long the enclosed block took under `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS.append((stage, time.perf_counter() - started))
+
+
+def startup_report():
+    lines = [f"  {stage:<28} {seconds * 1000:>9.1f} ms" for stage, seconds in STARTUP_TIMINGS]
+    lines.append(f"  {'since import':<28} {(time.perf_counter() - _started) * 1000:>9.1f} ms")
+    return "Startup timings:\n" + "\n".join(lines)
+
+
+def model_id(name=MODEL_NAME, backend=MODEL_BACKEND, file_name=MODEL_FILE):
+    """Identifier of the exact weights used, so caches never mix ONNX/quantized and torch vectors."""
+    if backend == "torch" and not file_name:
+        return name
+    return f"{name}#{backend}:{file_name or ''}"
+
+
+MODEL_ID = model_id()
+
+
+class LazyModel:
+    """SentenceTransformer that is imported and loaded on first use.
+
+    Constructing one is free, so the apps can start serving (and the CLI can
+    answer from the embedding cache) before torch and the weights are loaded.
+    Loading happens once, under a lock, whichever thread asks first; every
+    other attribute is forwarded to the loaded model.
+    """
+
+    def __init__(self, name=MODEL_NAME, backend=MODEL_BACKEND, file_name=MODEL_FILE, device=None):
+        self.name = name
+        self.backend = backend
+        self.file_name = file_name
+        self.device = device
+        self.model_id = model_id(name, backend, file_name)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    with startup_timer("import sentence_transformers"):
+                        from sentence_transformers import SentenceTransformer
+                    kwargs = {"device": self.device}
+                    if self.backend != "torch":
+                        kwargs["backend"] = self.backend
+                    if self.file_name:
+                        kwargs["model_kwargs"] = {"file_name": self.file_name}
+                    started = time.perf_counter()
+                    with startup_timer(f"load model ({self.backend})"):
+                        self._model = SentenceTransformer(self.name, **kwargs)
+                    print(f"Loaded {self.model_id} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        return self._model
+
+    def warm_up(self):
+        """Load the model and run one encode so the first real query pays no setup cost."""
+        with startup_timer("warm-up encode"):
+            self.load().encode(["In principio erat Verbum"])
+
+    def warm_up_in_background(self):
+        thread = threading.Thread(target=self.warm_up, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def encode(self, *args, **kwargs):
+        return self.load().encode(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set in __init__, e.g. start_multi_process_pool
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
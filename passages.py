@@ -0,0 +1,157 @@
+import argparse
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Passage lengths in verses; a window never crosses a chapter boundary
+PASSAGE_WINDOWS = [2, 3, 4, 5]
+PASSAGE_CACHE_PATH = os.getenv("PASSAGE_CACHE_PATH", "data/passage_embeddings.sqlite")
+# Room for every window of the Vulgate (about 140,000 passages) plus the edited versions of some
+PASSAGE_CACHE_SIZE = int(os.getenv("PASSAGE_CACHE_SIZE", "300000"))
+ENCODE_CHUNK = 1024
+
+
+def chapter_bounds(books, chapters):
+    """Row index where each chapter starts, plus a final end row, for rows grouped by book and chapter."""
+    change = np.ones(len(books), dtype=bool)
+    change[1:] = (books[1:] != books[:-1]) | (chapters[1:] != chapters[:-1])
+    return np.append(np.flatnonzero(change), len(books))
+
+
+def passage_spans(bounds, windows=PASSAGE_WINDOWS):
+    """(start row, length) of every window of each size in `windows` inside each chapter, chapter by chapter."""
+    starts, lengths, offsets = [], [], [0]
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        for n in windows:
+            if end - begin >= n:
+                starts.append(np.arange(begin, end - n + 1))
+                lengths.append(np.full(end - begin - n + 1, n))
+        offsets.append(offsets[-1] + sum(end - begin - n + 1 for n in windows if end - begin >= n))
+    if not starts:
+        return np.empty(0, np.int32), np.empty(0, np.int32), np.asarray(offsets, np.int64)
+    return np.concatenate(starts).astype(np.int32), np.concatenate(lengths).astype(np.int32), np.asarray(offsets, np.int64)
+
+
+class PassageIndex:
+    """Chapter centroids and sliding-window passage vectors over a local index.
+
+    Chapter `c` covers verse rows `bounds[c]:bounds[c + 1]` and its passages
+    are `starts[offsets[c]:offsets[c + 1]]` (first verse row) with `lengths`.
+    `centroids` are the normalized mean verse vectors of each chapter, used
+    to pick the chapters worth looking into before passages and verses are
+    scored. `version` is the ingestion version it was built for, if recorded.
+    """
+
+    def __init__(self, bounds, centroids, starts, lengths, offsets, vectors, version=None):
+        self.bounds = bounds
+        self.centroids = centroids
+        self.starts = starts
+        self.lengths = lengths
+        self.offsets = offsets
+        self.vectors = vectors
+        self.version = version
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def build(cls, books, chapters, texts, verse_vectors, encode, windows=PASSAGE_WINDOWS):
+        """`encode(list_of_texts)` embeds the joined text of each passage."""
+        bounds = chapter_bounds(books, chapters)
+        centroids = np.add.reduceat(np.asarray(verse_vectors, dtype=np.float32), bounds[:-1], axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        starts, lengths, offsets = passage_spans(bounds, windows)
+        vectors = np.empty((len(starts), centroids.shape[1]), dtype=np.float32)
+        for s in range(0, len(starts), ENCODE_CHUNK):
+            chunk = [" ".join(texts[start:start + n]) for start, n in zip(starts[s:s + ENCODE_CHUNK], lengths[s:s + ENCODE_CHUNK])]
+            vectors[s:s + len(chunk)] = encode(chunk)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return cls(bounds, centroids, starts, lengths, offsets, vectors)
+
+    def save(self, index_dir, version=None, windows=PASSAGE_WINDOWS):
+        """Save next to the local index, recording the ingestion `version` and `windows` it was built for.
+
+        Both files are renamed into place, so a backend that memory-mapped
+        the old vectors keeps reading them.
+        """
+        vectors_path = os.path.join(index_dir, "passage_vectors.npy")
+        with open(f"{vectors_path}.tmp", "wb") as f:
+            np.save(f, self.vectors)
+        path = os.path.join(index_dir, "passages.npz")
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                bounds=self.bounds,
+                centroids=self.centroids,
+                starts=self.starts,
+                lengths=self.lengths,
+                offsets=self.offsets,
+                version=np.asarray(version or ""),
+                windows=np.asarray(windows, dtype=np.int32),
+            )
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        data = np.load(os.path.join(index_dir, "passages.npz"))
+        vectors = np.load(os.path.join(index_dir, "passage_vectors.npy"), mmap_mode="r" if mmap else None)
+        version = str(data["version"]) if "version" in data else None
+        return cls(data["bounds"], data["centroids"], data["starts"], data["lengths"], data["offsets"], vectors, version or None)
+
+    def chapters_in(self, row_ranges):
+        """Ids of the chapters whose verses lie in the given (start, end) row ranges."""
+        return np.concatenate([
+            np.arange(np.searchsorted(self.bounds, start, "right") - 1, np.searchsorted(self.bounds, end, "left"))
+            for start, end in row_ranges
+        ]) if row_ranges else np.empty(0, dtype=np.int64)
+
+
+def passage_index_is_current(index_dir, version, windows=PASSAGE_WINDOWS):
+    """Whether `index_dir` has a passage index built for this ingestion version and these windows."""
+    path = os.path.join(index_dir, "passages.npz")
+    if not version or not os.path.exists(path):
+        return False
+    data = np.load(path)
+    return ("version" in data and str(data["version"]) == version
+            and sorted(data["windows"].tolist()) == sorted(windows))
+
+
+def build_passage_index(index_dir, model, windows=PASSAGE_WINDOWS, cache_path=PASSAGE_CACHE_PATH):
+    """Embed the passages of an existing local index and save them next to it.
+
+    Passage embeddings go through an `EmbeddingCache` on `cache_path`, so a
+    rebuild after a small edit only encodes the passages whose text changed.
+    """
+    from embedding_cache import EmbeddingCache
+    from verse_store import VerseStore
+    verses = VerseStore(os.path.join(index_dir, "verses.store"))
+    verse_vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+    cache = EmbeddingCache(model, maxsize=0, path=cache_path, disk_maxsize=PASSAGE_CACHE_SIZE)
+    try:
+        index = PassageIndex.build(
+            verses.books(), verses.chapters, verses.texts(),
+            verse_vectors, cache.encode, windows,
+        )
+    finally:
+        cache.close()
+    index.save(index_dir, verses.version, windows)
+    return index
+
+
+def main():
+    from model_loader import LazyModel
+    from search_backend import LOCAL_INDEX_DIR
+    parser = argparse.ArgumentParser(description="Build chapter centroids and passage embeddings for an existing local Vulgate index.")
+    parser.add_argument("--index-dir", type=str, help=f"Local index directory (default: {LOCAL_INDEX_DIR})", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--windows", type=str, help="Comma-separated passage lengths in verses (default: 2,3,4,5)", default="2,3,4,5")
+    args = parser.parse_args()
+
+    windows = sorted({int(w) for w in args.windows.split(",")})
+    index = build_passage_index(args.index_dir, LazyModel(), windows)
+    print(f"Indexed {len(index.centroids)} chapters and {len(index)} passages")
+
+if __name__ == "__main__":
+    main()
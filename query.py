@@ -1,11 +1,13 @@
 import argparse
 import os
-from sentence_transformers import SentenceTransformer
-import weaviate
-from weaviate.auth import Auth
-from weaviate.classes.query import MetadataQuery
-from weaviate.collections.classes.filters import Filter
+import sys
 from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache
+from model_loader import LazyModel, startup_report, startup_timer
+from query_daemon import QUERY_SOCKET, QueryClient, QueryService, serve
+from languages import vector_weights
+from search_backend import FUSIONS, SEARCH_BACKEND, SEARCH_THRESHOLD, open_backend
+from search_metrics import METRICS, SearchTrace, start_metrics_server
 
 # Book abbreviation mapping (from streamlit_app.py)
 vulgate_books = {"Genesis": "Gn", "Exodus": "Ex", "Leviticus": "Lv", "Numbers": "Nm", "Deuteronomy": "Dt", "Joshua": "Jos", "Judges": "Jdc", "Ruth": "Rt", "1 Samuel": "1Rg", "2 Samuel": "2Rg", "1 Kings": "3Rg", "2 Kings": "4Rg", "1 Chronicles": "1Par", "2 Chronicles": "2Par", "Ezra": "Esr", "Nehemiah": "Neh", "Tobit": "Tob", "Judith": "Jdt", "Esther": "Est", "1 Maccabees": "1Mcc", "2 Maccabees": "2Mcc", "Job": "Job", "Psalms": "Ps", "Proverbs": "Pr", "Ecclesiastes": "Ecl", "Song of Solomon": "Ct", "Wisdom": "Sap", "Sirach": "Sir", "Isaiah": "Is", "Jeremiah": "Jr", "Lamentations": "Lam", "Baruch": "Bar", "Ezekiel": "Ez", "Daniel": "Dn", "Hosea": "Os", "Joel": "Joel", "Amos": "Am", "Obadiah": "Abd", "Jonah": "Jon", "Micah": "Mch", "Nahum": "Nah", "Habakkuk": "Hab", "Zephaniah": "Soph", "Haggai": "Agg", "Zechariah": "Zach", "Malachi": "Mal", "Matthew": "Mt", "Mark": "Mc", "Luke": "Lc", "John": "Jo", "Acts": "Act", "Romans": "Rom", "1 Corinthians": "1Cor", "2 Corinthians": "2Cor", "Galatians": "Gal", "Ephesians": "Eph", "Philippians": "Phlp", "Colossians": "Col", "1 Thessalonians": "1Thes", "2 Thessalonians": "2Thes", "1 Timothy": "1Tim", "2 Timothy": "2Tim", "Titus": "Tit", "Philemon": "Phlm", "Hebrews": "Hbr", "James": "Jac", "1 Peter": "1Ptr", "2 Peter": "2Ptr", "1 John": "1Jo", "2 John": "2Jo", "3 John": "3Jo", "Jude": "Jud", "Revelation": "Apc"}
@@ -14,21 +16,88 @@ vulgate_books = {"Genesis": "Gn", "Exodus": "Ex", "Leviticus": "Lv", "Numbers":
 abbr_to_book = {abbr: name for name, abbr in vulgate_books.items()}
 
 
+def print_results(results, threshold):
+    found = False
+    for r in results:
+        if r["distance"] < threshold:
+            found = True
+            span = f"-{r['verse_end']}" if r.get("verse_end", r["verse"]) != r["verse"] else ""
+            print(f"{r['book']} {r['chapter']}:{r['verse']}{span} | {r['text']}")
+            print(f"  Similarity: {1 - r['distance']:.2f}\n")
+    if not found:
+        print("No results found. Try adjusting the similarity threshold or search query.")
+
+
+def run_query(query, embeddings, backend, books, args, client=None):
+    # Vector and passage searches drop rows past the threshold in the backend, so they are never fetched;
+    # hybrid distances are 1 - a fused score, which print_results filters instead
+    distance = None if args.hybrid else args.threshold
+    with SearchTrace("cli", query, books=books, limit=args.limit, hybrid=args.hybrid, alpha=args.alpha,
+                     fusion=args.fusion, passages=args.passages, threshold=args.threshold, daemon=client is not None) as trace:
+        if client is not None:
+            with trace.stage("daemon"):
+                if args.passages:
+                    results = client.request(query=query, limit=args.limit, books=books, passages=True, distance=distance)["results"]
+                else:
+                    results = client.search(query, limit=args.limit, books=books, hybrid=args.hybrid, alpha=args.alpha, fusion=args.fusion,
+                                            distance=distance, language=args.language)
+        else:
+            with trace.stage("encode"):
+                query_vector = embeddings.encode_one(query)
+            weights = vector_weights(query, backend.languages, args.language)
+            with trace.stage("search"):
+                if args.passages:
+                    results = backend.passage_search(query_vector, limit=args.limit, books=books, distance=distance)
+                elif args.hybrid:
+                    results = backend.hybrid_search(query, query_vector, limit=args.limit, books=books, alpha=args.alpha, fusion=args.fusion, weights=weights)
+                else:
+                    results = backend.search(query_vector, limit=args.limit, books=books, distance=distance, weights=weights)
+    if args.timings:
+        print(f"Search: {trace.breakdown()}", file=sys.stderr)
+    return results
+
+
+def repl(embeddings, backend, books, args, client=None):
+    """Read queries from stdin until EOF or an empty line, reusing one connection."""
+    while True:
+        try:
+            query = input("vulgate> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if not query:
+            break
+        print_results(run_query(query, embeddings, backend, books, args, client), args.threshold)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Query the Vulgate Weaviate DB by semantic similarity.")
-    parser.add_argument("query", type=str, help="Query text (required)")
+    parser.add_argument("query", type=str, nargs="?", help="Query text (required unless --interactive)")
     parser.add_argument("--book", type=str, help="Book abbreviation (e.g., 'Gn' for Genesis) or full name (e.g., 'Genesis')", default=None)
-    parser.add_argument("--threshold", type=float, help="Similarity threshold (default: 0.4)", default=0.4)
+    parser.add_argument("--threshold", type=float, help=f"Maximum cosine distance of a result (default: {SEARCH_THRESHOLD})", default=SEARCH_THRESHOLD)
     parser.add_argument("--limit", type=int, help="Number of results to return (default: 5)", default=5)
+    parser.add_argument("--cache-stats", action="store_true", help="Print embedding cache hit/miss counters")
+    parser.add_argument("--backend", choices=["weaviate", "local"], help=f"Search backend (default: {SEARCH_BACKEND})", default=SEARCH_BACKEND)
+    parser.add_argument("--hybrid", action="store_true", help="Combine keyword (BM25) and semantic scores; the threshold then applies to 1 - fused score")
+    parser.add_argument("--alpha", type=float, help="Hybrid weight of the semantic score, 0 = keyword only, 1 = semantic only (default: 0.5)", default=0.5)
+    parser.add_argument("--fusion", choices=FUSIONS, help="Hybrid score fusion: weighted scores or reciprocal rank fusion (default: alpha)", default="alpha")
+    parser.add_argument("--language", type=str, help="Vectors to search for an index built with translations: auto (by detected query language), all (fused), or a language such as latin or english (default: auto)", default="auto")
+    parser.add_argument("--passages", action="store_true", help="Return the best verse spans (chapter, then passage, then verse search; local backend only)")
+    parser.add_argument("-i", "--interactive", action="store_true", help="Read queries interactively, keeping the model and connection open")
+    parser.add_argument("--timings", action="store_true", help="Print where startup and search time went (imports, model load, encode, search) to stderr")
+    parser.add_argument("--metrics-file", type=str, help="Write search counters and latency histograms here on exit, in Prometheus text format", default=None)
+    parser.add_argument("--serve", action="store_true", help="Run as a daemon keeping the model and backend resident, serving queries on --socket")
+    parser.add_argument("--socket", type=str, help=f"Unix socket of the query daemon (default: {QUERY_SOCKET})", default=QUERY_SOCKET)
+    parser.add_argument("--no-daemon", action="store_true", help="Do not forward to a running query daemon")
+    parser.add_argument("--max-batch", type=int, help="--serve: most concurrent queries encoded in one call (default: 64)", default=64)
+    parser.add_argument("--max-wait-ms", type=float, help="--serve: how long to wait for more queries before encoding a batch (default: 5)", default=5.0)
     args = parser.parse_args()
-
-    load_dotenv()
-    WEAVIATE_URL = os.getenv("WEAVIATE_URL")
-    WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
-    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "Vulgate")
-
-    if not WEAVIATE_URL or not WEAVIATE_API_KEY:
-        print("Error: WEAVIATE_URL and WEAVIATE_API_KEY must be set in your .env file.")
+    if not args.query and not args.interactive and not args.serve:
+        parser.error("a query is required unless --interactive or --serve is given")
+    if args.passages and args.hybrid:
+        parser.error("--passages cannot be combined with --hybrid")
+    if args.passages and args.backend != "local":
+        print("Error: --passages needs the local index (--backend local); build it with main.py or passages.py.")
         exit(1)
 
     # Normalize book argument
@@ -41,38 +110,82 @@ def main():
         else:
             print(f"Unknown book: {args.book}. Use abbreviation (e.g., 'Gn') or full name (e.g., 'Genesis').")
             exit(1)
+    books = [book_abbr] if book_abbr else None
 
-    model = SentenceTransformer('sentence-transformers/LaBSE')
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=WEAVIATE_URL,
-        auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
-    )
-    vulgate = client.collections.get(COLLECTION_NAME)
-
-    query_vector = model.encode([args.query])[0]
-    if book_abbr:
-        response = vulgate.query.near_vector(
-            near_vector=query_vector,
-            limit=args.limit,
-            return_metadata=MetadataQuery(distance=True),
-            filters=Filter.by_property("book").equal(book_abbr)
-        )
-    else:
-        response = vulgate.query.near_vector(
-            near_vector=query_vector,
-            limit=args.limit,
-            return_metadata=MetadataQuery(distance=True)
-        )
+    # A running daemon answers without loading anything in this process, if it serves the backend asked for
+    client = None if args.serve or args.no_daemon else QueryClient.connect(args.socket)
+    if client is not None:
+        daemon = client.stats()
+        if daemon.get("backend") != args.backend:
+            print(f"Query daemon on {args.socket} serves the {daemon.get('backend')} backend, not {args.backend}; searching in this process.",
+                  file=sys.stderr)
+            client.close()
+            client = None
+        elif args.language not in ("auto", "all") and args.language not in daemon["languages"]:
+            print(f"Error: the index has no {args.language} vectors (available: {', '.join(daemon['languages'])}).")
+            client.close()
+            exit(1)
+    if client is not None:
+        try:
+            if args.query:
+                print_results(run_query(args.query, None, None, books, args, client), args.threshold)
+            if args.interactive:
+                repl(None, None, books, args, client)
+            if args.cache_stats:
+                print(f"Query daemon: {client.stats()}")
+        finally:
+            client.close()
+            if args.metrics_file:
+                METRICS.write(args.metrics_file)
+        return
 
-    found = False
-    for o in response.objects:
-        if o.metadata.distance < args.threshold:
-            found = True
-            print(f"{o.properties['book']} {o.properties['chapter']}:{o.properties['verse']} | {o.properties['text']}")
-            print(f"  Similarity: {1 - o.metadata.distance:.2f}\n")
-    if not found:
-        print("No results found. Try adjusting the similarity threshold or search query.")
-    client.close()
+    load_dotenv()
+    WEAVIATE_URL = os.getenv("WEAVIATE_URL")
+    WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
+    COLLECTION_NAME = os.getenv("COLLECTION_NAME", "Vulgate")
+
+    if args.backend == "weaviate" and (not WEAVIATE_URL or not WEAVIATE_API_KEY):
+        print("Error: WEAVIATE_URL and WEAVIATE_API_KEY must be set in your .env file.")
+        exit(1)
+
+    # The model is only loaded if the query misses the embedding cache
+    embeddings = EmbeddingCache(LazyModel())
+    with startup_timer("open backend"):
+        backend = open_backend(args.backend, WEAVIATE_URL, WEAVIATE_API_KEY, COLLECTION_NAME)
+    if args.language not in ("auto", "all") and args.language not in backend.languages:
+        print(f"Error: the index has no {args.language} vectors (available: {', '.join(backend.languages)}).")
+        exit(1)
+
+    if args.serve:
+        embeddings.model.warm_up()
+        print(startup_report(), file=sys.stderr)
+        service = QueryService(embeddings, backend, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        start_metrics_server()
+        try:
+            serve(service, args.socket)
+        finally:
+            if args.metrics_file:
+                METRICS.write(args.metrics_file)
+            service.close()
+            backend.close()
+            embeddings.close()
+        return
+
+    try:
+        if args.query:
+            print_results(run_query(args.query, embeddings, backend, books, args), args.threshold)
+        if args.interactive:
+            repl(embeddings, backend, books, args)
+    finally:
+        backend.close()
+        if args.metrics_file:
+            METRICS.write(args.metrics_file)
+
+    if args.cache_stats:
+        print(f"Embedding cache: {embeddings.stats()}")
+    if args.timings:
+        print(startup_report(), file=sys.stderr)
+    embeddings.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import numpy as np
+from dotenv import load_dotenv
+from languages import vector_weights
+from micro_batch import MicroBatcher
+from search_metrics import METRICS, SearchTrace
+
+load_dotenv()
+
+QUERY_SOCKET = os.getenv("QUERY_SOCKET", "data/query.sock")
+
+
+def _json_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+
+class QueryService:
+    """Answers query requests with a resident model and backend.
+
+    Queries arriving concurrently (from several clients or pipeline workers)
+    are encoded together: a `MicroBatcher` collects them for up to `max_wait`
+    seconds and makes one `EmbeddingCache.encode` call per batch.
+    """
+
+    def __init__(self, embeddings, backend, max_batch=64, max_wait=0.005):
+        self.embeddings = embeddings
+        self.backend = backend
+        self.encoder = MicroBatcher(embeddings.encode, max_batch=max_batch, max_wait=max_wait, name="query-encoder")
+
+    def stats(self):
+        return {
+            # Clients check these before forwarding, so a query is never answered by the wrong index
+            "backend": self.backend.kind,
+            "languages": list(self.backend.languages),
+            "encoder": self.encoder.stats(),
+            "embedding_cache": self.embeddings.stats(),
+            "stages": METRICS.stage_summary("daemon"),
+        }
+
+    def handle(self, request):
+        if request.get("stats"):
+            return {"stats": self.stats()}
+        query = request["query"]
+        limit = request.get("limit", 10)
+        books = request.get("books")
+        offset = request.get("offset", 0)
+        distance = request.get("distance")
+        with SearchTrace("daemon", query, books=books, limit=limit, offset=offset, hybrid=request.get("hybrid", False),
+                         alpha=request.get("alpha", 0.5), passages=request.get("passages", False), distance=distance) as trace:
+            with trace.stage("encode"):
+                vector = self.encoder(query)
+            weights = vector_weights(query, self.backend.languages, request.get("language", "auto"))
+            with trace.stage("search"):
+                if request.get("passages"):
+                    hits = self.backend.passage_search(vector, limit=limit, books=books, distance=distance)
+                elif request.get("hybrid"):
+                    hits = self.backend.hybrid_search(
+                        query, vector, limit=limit, books=books,
+                        alpha=request.get("alpha", 0.5), fusion=request.get("fusion", "alpha"), offset=offset, weights=weights,
+                    )
+                else:
+                    hits = self.backend.search(vector, limit=limit, books=books, distance=distance, offset=offset, weights=weights)
+        return {"results": hits}
+
+    def close(self):
+        self.encoder.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # One JSON request per line, one JSON response per line, for as long as the client stays connected
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.service.handle(json.loads(line))
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response, default=_json_default) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class QueryServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    # Unix sockets refuse connections outright once the backlog is full
+    request_queue_size = 128
+
+    def __init__(self, path, service):
+        self.service = service
+        super().__init__(path, _Handler)
+
+
+def serve(service, path=QUERY_SOCKET):
+    """Serve `service` on a Unix socket at `path` until interrupted."""
+    if os.path.exists(path):
+        if QueryClient.connect(path) is not None:
+            raise RuntimeError(f"A query daemon is already listening on {path}")
+        os.unlink(path)  # stale socket left by a daemon that was killed
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    old_umask = os.umask(0o177)  # socket readable/writable by the owner only
+    try:
+        server = QueryServer(path, service)
+    finally:
+        os.umask(old_umask)
+    # Let `kill` run the cleanup below too, so no stale socket is left behind
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Query daemon listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+class QueryClient:
+    """Connection to a running query daemon; requests on one client are sent one at a time."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, path=QUERY_SOCKET, timeout=60):
+        """Return a client, or None if no daemon is listening at `path`."""
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self, **request):
+        self._file.write((json.dumps(request) + "\n").encode("utf-8"))
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Query daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Query daemon error: {response['error']}")
+        return response
+
+    def search(self, query, limit=10, books=None, hybrid=False, alpha=0.5, fusion="alpha", offset=0, distance=None, language="auto"):
+        return self.request(query=query, limit=limit, books=books, hybrid=hybrid, alpha=alpha, fusion=fusion, offset=offset,
+                            distance=distance, language=language)["results"]
+
+    def stats(self):
+        return self.request(stats=True)["stats"]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
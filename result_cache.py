@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from embedding_cache import normalize_query
+
+load_dotenv()
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+# Seconds between checks of the backend's ingestion version
+RESULT_CACHE_VERSION_CHECK = float(os.getenv("RESULT_CACHE_VERSION_CHECK", "30"))
+# Seconds before a failed version check is retried
+RESULT_CACHE_VERSION_RETRY = float(os.getenv("RESULT_CACHE_VERSION_RETRY", "5"))
+
+
+def search_key(query, books=None, hybrid=False, alpha=0.5, fusion="alpha"):
+    """Cache key of a search: normalized query, book set and scoring mode, but not the limit."""
+    mode = ("hybrid", round(alpha, 4), fusion) if hybrid else ("vector",)
+    return (normalize_query(query), tuple(sorted(books or ())), mode)
+
+
+class ResultCache:
+    """TTL + LRU cache invalidated when the index's ingestion version changes.
+
+    With `limit` given, values are ranked lists and an entry stored for a
+    larger limit also answers smaller ones (a prefix of the ranking), so a
+    request for 10 results after one for 50 is a hit. Without `limit` the
+    value is returned as stored, which is how rendered HTML is memoized.
+
+    `version` is a callable returning the current ingestion version (e.g.
+    `backend.version`), which may do I/O. It is only called by
+    `check_version()`, never by `get()`, so an async caller can run the check
+    in a worker thread. It is called at most every `version_check` seconds,
+    and when its value changes every entry is dropped. A failing call is
+    logged and counted in `stats()["version_errors"]`, and retried after
+    `version_retry` seconds.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, version=None, version_check=RESULT_CACHE_VERSION_CHECK,
+                 version_retry=RESULT_CACHE_VERSION_RETRY):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_fn = version
+        self.version_check = version_check
+        self.version_retry = version_retry
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.version_errors = 0
+        self._next_check = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_version(self):
+        """Drop everything if the ingestion version changed; cheap between checks."""
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        if self._next_check is not None and now < self._next_check:
+            return
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            # Keep serving, but loudly: a version that can never be read means results are never invalidated
+            self.version_errors += 1
+            self._next_check = now + min(self.version_retry, self.version_check)
+            print(f"Result cache version check failed: {type(e).__name__}: {e}", file=sys.stderr)
+            return
+        self._next_check = now + self.version_check
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key, limit=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_limit, expires = entry
+                if time.monotonic() >= expires:
+                    del self._entries[key]
+                # A shorter list than its limit is the complete result set, so it answers any limit
+                elif limit is None or stored_limit >= limit or len(value) < stored_limit:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value if limit is None else value[:limit]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, limit=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and limit is not None and entry[1] > limit and time.monotonic() < entry[2]:
+                return  # keep the longer ranking
+            self._entries[key] = (value, limit, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "invalidations": self.invalidations,
+            "version_errors": self.version_errors,
+            "version": self.version,
+        }
@@ -0,0 +1,27 @@
+# The Gradio results table, kept out of app.py so it can be rendered (and benchmarked) without gradio or a backend.
+from typing import Any, Dict, List
+
+
+def format_results_html(results: List[Dict[str, Any]]) -> str:
+    if not results:
+        return "<div>No results found.</div>"
+    if "Error" in results[0]:
+        return f'<div style="color:red">Error: {results[0]["Error"]}</div>'
+    html = [
+        '<style>td,th{padding:8px;}th{background:#f4f1e9;}tr:nth-child(even){background:#f9f9f9;}tr:hover{background:#e6e2d3;}table{border-radius:8px;overflow:hidden;box-shadow:0 2px 8px #e6e2d3;}td{vertical-align:top;}</style>',
+        '<table style="border-collapse:collapse;width:100%;font-size:1em;">',
+        '<thead><tr>'
+        '<th>Reference</th><th>Text</th><th>Similarity</th><th>Book</th><th>Chapter</th><th>Verse</th>'
+        '</tr></thead><tbody>'
+    ]
+    for r in results:
+        html.append(f'<tr>'
+            f'<td>{r["Reference"]}</td>'
+            f'<td>{r["Text"]}</td>'
+            f'<td>{r["Similarity"]}</td>'
+            f'<td>{r["Book"]}</td>'
+            f'<td>{r["Chapter"]}</td>'
+            f'<td>{r["Verse"]}</td>'
+            f'</tr>')
+    html.append('</tbody></table>')
+    return ''.join(html)
@@ -0,0 +1,792 @@
+import argparse
+import asyncio
+import json
+import atexit
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from dotenv import load_dotenv
+from bm25 import BM25Index
+from languages import PRIMARY_LANGUAGE
+from passages import PassageIndex
+from verse_store import VERSE_STORE_PATH, VerseStore
+
+load_dotenv()
+
+# Which backend the CLI and apps search against: "weaviate" or "local".
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "weaviate")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/vulgate_index")
+# Default maximum cosine distance of a match for the CLIs; tune it with evaluate.py
+SEARCH_THRESHOLD = float(os.getenv("SEARCH_THRESHOLD", "0.4"))
+QUANTIZATIONS = ["none", "int8", "pca"]
+# Hybrid search: "alpha" blends min-max normalized scores, "rrf" is reciprocal rank fusion.
+FUSIONS = ["alpha", "rrf"]
+RRF_K = 60
+INT8_BLOCK_ROWS = 256
+# main.py records each ingestion in the collection description as this prefix + version
+INGEST_VERSION_PREFIX = "ingest-version:"
+
+
+class WeaviateBackend:
+    """Vector search against a Weaviate collection over one long-lived client.
+
+    The client is created on first use and shared by all threads. It is
+    health-checked at most every `health_check_interval` seconds, and a query
+    that fails with a connection error reconnects and is retried once.
+
+    A collection created with `main.py --translations` has one named vector
+    per language; `weights` (see `languages.vector_weights`) then picks one
+    or has Weaviate fuse several in the same query.
+    """
+
+    kind = "weaviate"
+
+    def __init__(self, url, api_key, collection_name, workers=8, health_check_interval=30):
+        self.url = url
+        self.api_key = api_key
+        self.collection_name = collection_name
+        self.workers = workers
+        self.health_check_interval = health_check_interval
+        self._client = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._async_client = None
+        self._async_loop = None
+        self._async_checked_at = 0.0
+        self._async_lock = None
+        self._named_vectors = None
+
+    def _connect(self):
+        import weaviate
+        from weaviate.auth import Auth
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+        self._client = weaviate.connect_to_weaviate_cloud(
+            cluster_url=self.url,
+            auth_credentials=Auth.api_key(self.api_key),
+        )
+        self._checked_at = time.monotonic()
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._client is None:
+                self._connect()
+            elif time.monotonic() - self._checked_at > self.health_check_interval:
+                try:
+                    healthy = self._client.is_ready()
+                except Exception:
+                    healthy = False
+                if healthy:
+                    self._checked_at = time.monotonic()
+                else:
+                    self._connect()
+            return self._client.collections.get(self.collection_name)
+
+    def reconnect(self):
+        with self._lock:
+            self._connect()
+
+    def ping(self):
+        """Connect if needed and report whether the server is ready."""
+        try:
+            self.collection
+            return self._client.is_ready()
+        except Exception:
+            return False
+
+    def version(self):
+        """Ingestion version main.py stored in the collection description, or None."""
+        description = self.collection.config.get().description or ""
+        if description.startswith(INGEST_VERSION_PREFIX):
+            return description[len(INGEST_VERSION_PREFIX):]
+        return None
+
+    @property
+    def languages(self):
+        """Named vectors of the collection, or just Latin for a collection with a single unnamed vector."""
+        if self._named_vectors is None:
+            self._named_vectors = list(self.collection.config.get().vector_config or {})
+        return self._named_vectors or [PRIMARY_LANGUAGE]
+
+    def _target(self, weights):
+        """`target_vector` for the given vector weights: one name, or Weaviate's weighted multi-target fusion."""
+        languages = self.languages
+        if not self._named_vectors:
+            if weights and set(weights) != {PRIMARY_LANGUAGE}:
+                raise ValueError(f"Collection {self.collection_name} has no translation vectors")
+            return None
+        weights = weights or {PRIMARY_LANGUAGE: 1.0}
+        unknown = set(weights) - set(languages)
+        if unknown:
+            raise ValueError(f"Collection {self.collection_name} has no {', '.join(sorted(unknown))} vectors")
+        if len(weights) == 1:
+            return next(iter(weights))
+        from weaviate.classes.query import TargetVectors
+        return TargetVectors.manual_weights(dict(weights))
+
+    @staticmethod
+    def _text_property(weights):
+        """Property searched by BM25 in a hybrid query: the text of the most weighted language."""
+        language = max(weights, key=weights.get) if weights else PRIMARY_LANGUAGE
+        return "text" if language == PRIMARY_LANGUAGE else language
+
+    @staticmethod
+    def _near_vector_args(vector, limit, books, distance, offset=0, target=None):
+        from weaviate.classes.query import MetadataQuery
+        from weaviate.collections.classes.filters import Filter
+        return {
+            "near_vector": vector,
+            "target_vector": target,
+            "limit": limit,
+            "offset": offset or None,
+            "distance": distance,
+            "return_metadata": MetadataQuery(distance=True),
+            "filters": Filter.by_property("book").contains_any(list(books)) if books else None,
+        }
+
+    @staticmethod
+    def _hybrid_args(query, vector, limit, books, alpha, fusion, offset=0, target=None, text_property="text"):
+        from weaviate.classes.query import HybridFusion, MetadataQuery
+        from weaviate.collections.classes.filters import Filter
+        return {
+            "query": query,
+            "vector": vector,
+            "target_vector": target,
+            "query_properties": [text_property],
+            "alpha": alpha,
+            "fusion_type": HybridFusion.RANKED if fusion == "rrf" else HybridFusion.RELATIVE_SCORE,
+            "limit": limit,
+            "offset": offset or None,
+            "return_metadata": MetadataQuery(score=True),
+            "filters": Filter.by_property("book").contains_any(list(books)) if books else None,
+        }
+
+    @staticmethod
+    def _hits(response, fusion=None):
+        """Hits of a near_vector query, or of a hybrid query fused with `fusion`."""
+        # Weaviate's ranked fusion sums 1 / (60 + rank) terms; scale it to [0, 1] as LocalBackend does
+        scale = RRF_K + 1 if fusion == "rrf" else 1
+        return [{
+            "book": o.properties["book"],
+            "chapter": o.properties["chapter"],
+            "verse": o.properties["verse"],
+            "text": o.properties["text"],
+            "distance": o.metadata.distance if fusion is None else max(1 - scale * o.metadata.score, 0.0),
+        } for o in response.objects]
+
+    def _search(self, vector, limit, books, distance, offset=0, weights=None):
+        args = self._near_vector_args(vector, limit, books, distance, offset, self._target(weights))
+        return self._hits(self.collection.query.near_vector(**args))
+
+    def _hybrid_search(self, query, vector, limit, books, alpha, fusion, offset=0, weights=None):
+        args = self._hybrid_args(query, vector, limit, books, alpha, fusion, offset, self._target(weights), self._text_property(weights))
+        return self._hits(self.collection.query.hybrid(**args), fusion)
+
+    def _retry(self, fn, *args):
+        from weaviate.exceptions import (
+            WeaviateClosedClientError,
+            WeaviateConnectionError,
+            WeaviateGRPCUnavailableError,
+        )
+        try:
+            return fn(*args)
+        except (WeaviateClosedClientError, WeaviateConnectionError, WeaviateGRPCUnavailableError):
+            self.reconnect()
+            return fn(*args)
+
+    def search(self, vector, limit=10, books=None, distance=None, offset=0, weights=None):
+        """Hits `offset` to `offset + limit` of the ranking, for paging through long result lists."""
+        return self._retry(self._search, vector, limit, books, distance, offset, weights)
+
+    def hybrid_search(self, query, vector, limit=10, books=None, alpha=0.5, fusion="alpha", offset=0, weights=None):
+        """Weaviate's own BM25 + vector hybrid query, in one round trip.
+
+        `distance` in the results is 1 - the fused score, with RRF scores
+        scaled to [0, 1] as in `LocalBackend.hybrid_search`.
+        """
+        return self._retry(self._hybrid_search, query, vector, limit, books, alpha, fusion, offset, weights)
+
+    async def _async_collection(self, reconnect=False):
+        """Collection handle on the async client, which is bound to the running event loop."""
+        import weaviate
+        from weaviate.auth import Auth
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            client = self._async_client
+            if client is not None and not reconnect and time.monotonic() - self._async_checked_at > self.health_check_interval:
+                try:
+                    reconnect = not await client.is_ready()
+                except Exception:
+                    reconnect = True
+                self._async_checked_at = time.monotonic()
+            if client is not None and reconnect:
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+                client = self._async_client = None
+            if client is None:
+                client = weaviate.use_async_with_weaviate_cloud(
+                    cluster_url=self.url,
+                    auth_credentials=Auth.api_key(self.api_key),
+                )
+                await client.connect()
+                self._async_client = client
+                self._async_loop = asyncio.get_running_loop()
+                self._async_checked_at = time.monotonic()
+            return client.collections.get(self.collection_name)
+
+    async def async_connect(self):
+        """Open (or health-check) the async client ahead of a query, so connecting can be timed on its own."""
+        await self._async_collection()
+        if self._named_vectors is None:
+            await asyncio.to_thread(lambda: self.languages)
+
+    async def _async_retry(self, method, kwargs, fusion=None):
+        from weaviate.exceptions import (
+            WeaviateClosedClientError,
+            WeaviateConnectionError,
+            WeaviateGRPCUnavailableError,
+        )
+        try:
+            collection = await self._async_collection()
+            return self._hits(await getattr(collection.query, method)(**kwargs), fusion)
+        except (WeaviateClosedClientError, WeaviateConnectionError, WeaviateGRPCUnavailableError):
+            collection = await self._async_collection(reconnect=True)
+            return self._hits(await getattr(collection.query, method)(**kwargs), fusion)
+
+    async def async_search(self, vector, limit=10, books=None, distance=None, offset=0, weights=None):
+        """`search` on Weaviate's async client, so an event loop is not blocked for the round trip."""
+        await self.async_connect()
+        args = self._near_vector_args(vector, limit, books, distance, offset, self._target(weights))
+        return await self._async_retry("near_vector", args)
+
+    async def async_hybrid_search(self, query, vector, limit=10, books=None, alpha=0.5, fusion="alpha", offset=0, weights=None):
+        await self.async_connect()
+        args = self._hybrid_args(query, vector, limit, books, alpha, fusion, offset, self._target(weights), self._text_property(weights))
+        return await self._async_retry("hybrid", args, fusion)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            client, self._async_client, self._async_loop = self._async_client, None, None
+            await client.close()
+
+    def search_batch(self, vectors, limit=10, books=None, distance=None, weights=None):
+        """Run one near_vector query per vector, `workers` at a time."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return list(self._executor.map(lambda v: self.search(v, limit, books, distance, weights=weights), vectors))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+        self._close_async_client()
+
+    def _close_async_client(self, timeout=5):
+        """Close the async client on the event loop it was opened on, the only one it can be used from.
+
+        That loop must still exist: apps close the backend before their
+        server stops its loop (see app.py).
+        """
+        client, loop = self._async_client, self._async_loop
+        self._async_client = self._async_loop = None
+        if client is None:
+            return
+        try:
+            if loop.is_running():
+                try:
+                    on_loop = asyncio.get_running_loop() is loop
+                except RuntimeError:
+                    on_loop = False
+                if on_loop:
+                    loop.create_task(client.close())  # waiting here would block the loop the close needs
+                else:
+                    asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            elif not loop.is_closed():
+                loop.run_until_complete(client.close())
+            else:
+                print("Warning: the async Weaviate client's event loop was closed before the client.", file=sys.stderr)
+        except Exception as e:
+            print(f"Warning: could not close the async Weaviate client: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+class LocalBackend:
+    """In-process brute-force search over the saved Vulgate embeddings.
+
+    The index directory holds a float32 matrix of L2-normalized vectors
+    (`vectors.npy`, memory-mapped), the verse metadata and text in the same
+    row order (`verses.store`, a memory-mapped `VerseStore`, so worker
+    processes share one copy in the page cache) and the [start, end) row
+    range of every book (`book_ranges.json`), so a book filter is just a set
+    of matrix slices.
+
+    If the index was built with int8 or PCA quantization (see `config.json`),
+    rows are first scored against the compact matrix, and the best
+    `limit * rescore` candidates are rescored with the full-precision
+    vectors, of which only those rows are paged in.
+
+    Translations embedded by `main.py --translations` are extra matrices
+    (`vectors_<language>.npy`) in the same row order. With `weights` a row
+    scores the weighted sum of its similarities under each named vector,
+    computed exactly from the full-precision matrices.
+
+    A rebuild renames new files over the old ones (see `build_local_index`),
+    so the memory maps of a running backend keep reading the index it
+    loaded. `config.json` is replaced last, and every search first checks
+    whether it changed and, if so, reloads the whole index.
+    """
+
+    kind = "local"
+
+    def __init__(self, index_dir=LOCAL_INDEX_DIR, mmap=True, rescore=4):
+        self.index_dir = index_dir
+        self.mmap = mmap
+        # Taken before anything is loaded, so a rebuild finishing meanwhile is picked up by the next refresh()
+        self._stamp = self._config_stamp()
+        self._bm25 = None
+        self._passages = None
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r" if mmap else None)
+        store_path = os.path.join(index_dir, "verses.store")
+        if not os.path.exists(store_path):
+            raise FileNotFoundError(f"{store_path} not found; rebuild the index with `python search_backend.py`")
+        self.store = VerseStore(store_path)
+        self.chapters = self.store.chapters
+        self.verses = self.store.verses
+        with open(os.path.join(index_dir, "book_ranges.json")) as f:
+            self.book_ranges = {book: tuple(r) for book, r in json.load(f).items()}
+        config_path = os.path.join(index_dir, "config.json")
+        config = {"quantization": "none"}
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+        self.quantization = config["quantization"]
+        self.ingest_version = config.get("version")
+        self.languages = config.get("languages", [PRIMARY_LANGUAGE])
+        self.named_vectors = {PRIMARY_LANGUAGE: self.vectors}
+        for language in self.languages:
+            if language != PRIMARY_LANGUAGE:
+                path = os.path.join(index_dir, f"vectors_{language}.npy")
+                self.named_vectors[language] = np.load(path, mmap_mode="r" if mmap else None)
+        self._bm25s = {}
+        self.rescore = rescore
+        if self.quantization == "int8":
+            self.coarse = np.load(os.path.join(index_dir, "vectors_int8.npy"))
+            self.scales = np.load(os.path.join(index_dir, "scales.npy"))
+        elif self.quantization == "pca":
+            self.coarse = np.load(os.path.join(index_dir, "vectors_pca.npy"))
+            self.projection = np.load(os.path.join(index_dir, "pca_components.npy"))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _config_stamp(self):
+        try:
+            st = os.stat(os.path.join(self.index_dir, "config.json"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def refresh(self):
+        """Reload the index if a rebuild has replaced it since it was loaded; return whether it did."""
+        if self._config_stamp() == self._stamp:
+            return False
+        fresh = LocalBackend(self.index_dir, self.mmap, self.rescore)
+        self.__dict__.update(fresh.__dict__)
+        return True
+
+    @staticmethod
+    def _normalize(vectors):
+        q = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return q / np.maximum(np.linalg.norm(q, axis=-1, keepdims=True), 1e-12)
+
+    def _weights(self, weights):
+        """`weights` checked against the index's vectors, or None when only the Latin vector is searched."""
+        if not weights or set(weights) == {PRIMARY_LANGUAGE}:
+            return None
+        unknown = set(weights) - set(self.named_vectors)
+        if unknown:
+            raise ValueError(f"The local index has no {', '.join(sorted(unknown))} vectors; rebuild it with main.py --translations")
+        return weights
+
+    def _score_range(self, start, end, q, weights=None):
+        """Similarities of rows [start, end) to the (n, dim) queries `q`, shape (rows, n)."""
+        if weights:
+            return sum(w * (self.named_vectors[name][start:end] @ q.T) for name, w in weights.items())
+        if self.quantization == "int8":
+            # Dequantize in cache-sized blocks rather than upcasting the whole matrix.
+            out = np.empty((end - start, len(q)), dtype=np.float32)
+            buf = np.empty((INT8_BLOCK_ROWS, q.shape[1]), dtype=np.float32)
+            for s in range(start, end, INT8_BLOCK_ROWS):
+                e = min(s + INT8_BLOCK_ROWS, end)
+                block = buf[:e - s]
+                np.copyto(block, self.coarse[s:e], casting="unsafe")
+                out[s - start:e - start] = block @ q.T
+            return out * self.scales[start:end, None]
+        if self.quantization == "pca":
+            return self.coarse[start:end] @ (q @ self.projection.T).T
+        return self.vectors[start:end] @ q.T
+
+    def _scores(self, q, books=None, weights=None):
+        """Return (row_ids, similarities of shape (rows, n_queries)) for the selected books."""
+        if books:
+            ranges = [self.book_ranges[b] for b in books if b in self.book_ranges]
+        else:
+            ranges = [(0, len(self.vectors))]
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(q)), dtype=np.float32)
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        sims = np.concatenate([self._score_range(start, end, q, weights) for start, end in ranges])
+        return rows, sims
+
+    def _top_k(self, rows, sims, q, limit, distance, offset=0, weights=None):
+        limit += offset
+        # Weighted scores come from the full-precision matrices already
+        if self.quantization != "none" and not weights and len(sims):
+            candidates = min(len(sims), limit * self.rescore)
+            if len(sims) > candidates:
+                top = np.argpartition(-sims, candidates - 1)[:candidates]
+                rows = rows[top]
+            sims = self.vectors[np.sort(rows)] @ q
+            rows = np.sort(rows)
+        if distance is not None:
+            keep = sims > 1 - distance
+            rows, sims = rows[keep], sims[keep]
+        if len(sims) > limit:
+            top = np.argpartition(-sims, limit - 1)[:limit]
+            rows, sims = rows[top], sims[top]
+        order = np.argsort(-sims, kind="stable")[offset:]
+        return [self.row(int(rows[i]), float(1 - sims[i])) for i in order]
+
+    def search(self, vector, limit=10, books=None, distance=None, offset=0, weights=None):
+        """Hits `offset` to `offset + limit` of the ranking; only that many rows are materialized."""
+        self.refresh()
+        weights = self._weights(weights)
+        q = self._normalize(vector)
+        rows, sims = self._scores(q, books, weights)
+        return self._top_k(rows, sims[:, 0], q[0], limit, distance, offset, weights)
+
+    def search_batch(self, vectors, limit=10, books=None, distance=None, weights=None):
+        """Score all queries with one matrix product, then take each top-k."""
+        self.refresh()
+        weights = self._weights(weights)
+        q = self._normalize(vectors)
+        rows, sims = self._scores(q, books, weights)
+        return [self._top_k(rows, sims[:, j], q[j], limit, distance, weights=weights) for j in range(len(q))]
+
+    @property
+    def bm25(self):
+        if self._bm25 is None:
+            self._bm25 = BM25Index.load(os.path.join(self.index_dir, "bm25.npz"))
+        return self._bm25
+
+    def bm25_for(self, language):
+        """BM25 over the verse text in `language` (the Latin text, or a translation)."""
+        if language == PRIMARY_LANGUAGE:
+            return self.bm25
+        if language not in self._bm25s:
+            self._bm25s[language] = BM25Index.load(os.path.join(self.index_dir, f"bm25_{language}.npz"))
+        return self._bm25s[language]
+
+    def hybrid_search(self, query, vector, limit=10, books=None, alpha=0.5, fusion="alpha", offset=0, weights=None):
+        """Fuse BM25 over the verse text with vector similarity.
+
+        With fusion="alpha" both scores are min-max normalized over the
+        selected rows and blended as alpha * vector + (1 - alpha) * lexical
+        (alpha=1 is pure vector search, as in Weaviate). With fusion="rrf"
+        each row scores alpha / (60 + vector rank) + (1 - alpha) / (60 +
+        lexical rank) over the top candidates of each list. `distance` in the
+        results is 1 - the fused score scaled to [0, 1]. With `weights` the
+        lexical side matches the text of the most weighted language.
+
+        On an int8 or PCA index only the best `limit * rescore` rows of each
+        list are fused, with their vector scores rescored exactly (as in
+        `search`), so both fusions see cosine similarities.
+        """
+        self.refresh()
+        weights = self._weights(weights)
+        q = self._normalize(vector)
+        rows, sims = self._scores(q, books, weights)
+        sims = sims[:, 0]
+        if not len(rows):
+            return []
+        language = max(weights, key=weights.get) if weights else PRIMARY_LANGUAGE
+        lexical = self.bm25_for(language).scores(query)[rows]
+        limit += offset
+        # Weighted scores come from the full-precision matrices already
+        if self.quantization != "none" and not weights:
+            candidates = min(len(rows), limit * self.rescore)
+            pool = np.union1d(np.argpartition(-sims, candidates - 1)[:candidates],
+                              np.argsort(-lexical, kind="stable")[:candidates])
+            rows, lexical = rows[pool], lexical[pool]
+            sims = self.vectors[rows] @ q[0]
+        if fusion == "rrf":
+            candidates = min(len(rows), limit * self.rescore)
+            fused = np.zeros(len(rows), dtype=np.float32)
+            for weight, scores in ((alpha, sims), (1 - alpha, lexical)):
+                top = np.argsort(-scores, kind="stable")[:candidates]
+                if scores is lexical:
+                    top = top[lexical[top] > 0]
+                fused[top] += weight / (RRF_K + 1 + np.arange(len(top)))
+            fused *= RRF_K + 1
+        elif fusion == "alpha":
+            span = sims.max() - sims.min()
+            vector_part = (sims - sims.min()) / span if span > 0 else np.ones_like(sims)
+            lexical_part = lexical / lexical.max() if lexical.max() > 0 else lexical
+            fused = alpha * vector_part + (1 - alpha) * lexical_part
+        else:
+            raise ValueError(f"Unknown fusion: {fusion}")
+        if len(fused) > limit:
+            top = np.argpartition(-fused, limit - 1)[:limit]
+            rows, fused = rows[top], fused[top]
+        order = np.argsort(-fused, kind="stable")[offset:]
+        return [self.row(int(rows[i]), float(1 - fused[i])) for i in order]
+
+    @property
+    def passages(self):
+        if self._passages is None:
+            index = PassageIndex.load(self.index_dir)
+            # main.py rebuilds the passages after the verses, so for a moment they can belong to the previous ingestion
+            if index.version and self.ingest_version and index.version != self.ingest_version:
+                raise RuntimeError("The passage index was built for another ingestion; wait for main.py to finish "
+                                   "or rebuild it with `python passages.py`")
+            self._passages = index
+        return self._passages
+
+    def _spans(self, chapter_ids, q, limit, distance):
+        """Best non-overlapping verse and passage spans inside the given chapters."""
+        index = self.passages
+        spans = []
+        for c in chapter_ids:
+            begin, end = index.bounds[c], index.bounds[c + 1]
+            sims = self.vectors[begin:end] @ q
+            spans.extend(zip(sims.tolist(), range(begin, end), [1] * (end - begin)))
+            p_begin, p_end = index.offsets[c], index.offsets[c + 1]
+            if p_end > p_begin:
+                sims = index.vectors[p_begin:p_end] @ q
+                spans.extend(zip(sims.tolist(), index.starts[p_begin:p_end].tolist(), index.lengths[p_begin:p_end].tolist()))
+        spans.sort(key=lambda span: -span[0])
+        taken = np.zeros(len(self.vectors), dtype=bool)
+        hits = []
+        for sim, start, n in spans:
+            if len(hits) == limit or (distance is not None and 1 - sim >= distance):
+                break
+            if taken[start:start + n].any():
+                continue
+            taken[start:start + n] = True
+            hit = self.row(start, float(1 - sim))
+            hit["verse_end"] = int(self.verses[start + n - 1])
+            hit["text"] = " ".join(self.store.text(r) for r in range(start, start + n))
+            hits.append(hit)
+        return hits
+
+    def passage_search_batch(self, vectors, limit=10, books=None, distance=None, chapters=20):
+        """Coarse-to-fine span search: chapter centroids, then passages and verses.
+
+        Each query is scored against every chapter centroid (one matrix
+        product for the batch); only the best `chapters` chapters are opened,
+        and their single verses and 2-5 verse passages (see passages.py)
+        compete for the result. Hits are the best non-overlapping spans, with
+        `verse_end` set to the last verse and `text` the joined span text.
+        """
+        self.refresh()
+        q = self._normalize(vectors)
+        index = self.passages
+        if books:
+            candidates = index.chapters_in([self.book_ranges[b] for b in books if b in self.book_ranges])
+        else:
+            candidates = np.arange(len(index.centroids))
+        if not len(candidates):
+            return [[] for _ in q]
+        chapter_sims = index.centroids[candidates] @ q.T
+        n = min(chapters, len(candidates))
+        results = []
+        for j in range(len(q)):
+            top = candidates[np.argpartition(-chapter_sims[:, j], n - 1)[:n]]
+            results.append(self._spans(np.sort(top), q[j], limit, distance))
+        return results
+
+    def passage_search(self, vector, limit=10, books=None, distance=None, chapters=20):
+        return self.passage_search_batch(vector, limit, books, distance, chapters)[0]
+
+    # NumPy releases the GIL in the matrix products, so a worker thread keeps the event loop free
+    async def async_search(self, vector, limit=10, books=None, distance=None, offset=0, weights=None):
+        return await asyncio.to_thread(self.search, vector, limit, books, distance, offset, weights)
+
+    async def async_hybrid_search(self, query, vector, limit=10, books=None, alpha=0.5, fusion="alpha", offset=0, weights=None):
+        return await asyncio.to_thread(self.hybrid_search, query, vector, limit, books, alpha, fusion, offset, weights)
+
+    async def async_connect(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def ping(self):
+        return True
+
+    def version(self):
+        self.refresh()
+        return self.ingest_version
+
+    def row(self, i, distance=None):
+        return {**self.store.row(i), "distance": distance}
+
+    def close(self):
+        pass
+
+
+def _replace_file(path, write):
+    """Write `path` with `write(file)` under a temporary name, then rename it over the old file.
+
+    Processes that memory-mapped the old file keep reading it instead of
+    seeing it change (or shrink) under them.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _save_array(path, array):
+    _replace_file(path, lambda f: np.save(f, array))
+
+
+def build_local_index(df, embeddings, index_dir=LOCAL_INDEX_DIR, quantization="none", dims=256, version=None,
+                      translations=None):
+    """Write the local index for `df` (columns latin/book/chapter/verse) and its embeddings.
+
+    `quantization` adds a compact matrix used for the first scoring pass:
+    "int8" (symmetric per-row scalar quantization) or "pca" (projection
+    onto the top `dims` principal components). The full-precision vectors
+    are always written for rescoring. `version` is the ingestion version
+    reported by `LocalBackend.version()`. `translations` maps a language to
+    the embeddings of `df[language]`, which are saved as named vectors.
+
+    Every file is renamed into place and `config.json` comes last, so a
+    running `LocalBackend` serves the old index until it sees the new config.
+    """
+    import pandas as pd
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.array(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    # Group rows by book (keeping canonical order) so each book is one contiguous range.
+    book_order = {b: i for i, b in enumerate(pd.unique(df["book"]))}
+    order = np.argsort(df["book"].map(book_order).to_numpy(), kind="stable")
+    vectors = np.ascontiguousarray(vectors[order])
+    books = df["book"].to_numpy()[order]
+    texts = df["latin"].astype(str).to_numpy()[order].tolist()
+    translations = translations or {}
+    translated_texts = {}
+    for language, translated in translations.items():
+        translated_texts[language] = df[language].fillna("").astype(str).to_numpy()[order].tolist()
+        translated = np.array(translated, dtype=np.float32)
+        translated /= np.maximum(np.linalg.norm(translated, axis=1, keepdims=True), 1e-12)
+        _save_array(os.path.join(index_dir, f"vectors_{language}.npy"), np.ascontiguousarray(translated[order]))
+        BM25Index.build(translated_texts[language]).save(os.path.join(index_dir, f"bm25_{language}.npz"))
+    _save_array(os.path.join(index_dir, "vectors.npy"), vectors)
+    VerseStore.build(os.path.join(index_dir, "verses.store"), books, df["chapter"].to_numpy()[order],
+                     df["verse"].to_numpy()[order], texts, translations=translated_texts, version=version)
+    book_ranges = {}
+    for i, book in enumerate(books):
+        start, _ = book_ranges.get(book, (i, i))
+        book_ranges[book] = (start, i + 1)
+    _replace_file(os.path.join(index_dir, "book_ranges.json"), lambda f: f.write(json.dumps(book_ranges).encode("utf-8")))
+    BM25Index.build(texts).save(os.path.join(index_dir, "bm25.npz"))
+
+    if quantization == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        _save_array(os.path.join(index_dir, "vectors_int8.npy"), np.round(vectors / scales[:, None]).astype(np.int8))
+        _save_array(os.path.join(index_dir, "scales.npy"), scales.astype(np.float32))
+    elif quantization == "pca":
+        # The mean term q·mean is the same for every row, so ranking only needs the
+        # centered projections.
+        centered = vectors - vectors.mean(axis=0)
+        _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        components = np.ascontiguousarray(eigenvectors[:, ::-1][:, :dims].T, dtype=np.float32)
+        _save_array(os.path.join(index_dir, "vectors_pca.npy"), np.ascontiguousarray(centered @ components.T, dtype=np.float32))
+        _save_array(os.path.join(index_dir, "pca_components.npy"), components)
+    config = {
+        "quantization": quantization,
+        "dims": dims if quantization == "pca" else vectors.shape[1],
+        "version": version,
+        "languages": [PRIMARY_LANGUAGE, *translations],
+    }
+    _replace_file(os.path.join(index_dir, "config.json"), lambda f: f.write(json.dumps(config).encode("utf-8")))
+
+
+@lru_cache(maxsize=None)
+def load_local_backend(index_dir=LOCAL_INDEX_DIR):
+    return LocalBackend(index_dir)
+
+
+def open_backend(kind=None, url=None, api_key=None, collection_name=None, **kwargs):
+    """Return a search backend; the caller must `close()` it when done.
+
+    Extra keyword arguments are passed to `WeaviateBackend`.
+    """
+    kind = kind or SEARCH_BACKEND
+    if kind == "local":
+        return load_local_backend()
+    if kind == "weaviate":
+        return WeaviateBackend(url, api_key, collection_name, **kwargs)
+    raise ValueError(f"Unknown search backend: {kind}")
+
+
+@lru_cache(maxsize=None)
+def shared_backend(kind=None, url=None, api_key=None, collection_name=None):
+    """Process-wide backend for long-running apps, closed at interpreter exit."""
+    backend = open_backend(kind, url, api_key, collection_name)
+    atexit.register(backend.close)
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local Vulgate vector index from the saved embeddings.")
+    parser.add_argument("--store", type=str, help=f"Verse store written by main.py (default: {VERSE_STORE_PATH})", default=VERSE_STORE_PATH)
+    parser.add_argument("--parquet", type=str, help="Read an embeddings parquet with an 'embedding' column (as written by older versions and the notebook) instead of --store", default=None)
+    parser.add_argument("--index-dir", type=str, help=f"Output directory (default: {LOCAL_INDEX_DIR})", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, help="Compact matrix for first-pass scoring (default: none)", default="none")
+    parser.add_argument("--pca-dims", type=int, help="Dimensions kept by --quantization pca (default: 256)", default=256)
+    args = parser.parse_args()
+
+    import pandas as pd
+    version = None
+    translations = {}
+    if args.parquet:
+        df = pd.read_parquet(args.parquet)
+        embeddings = np.stack(df["embedding"].to_numpy())
+    else:
+        # Carry over what the ingestion recorded, so the rebuilt index searches and reports the same
+        store = VerseStore(args.store)
+        df = pd.DataFrame({"book": store.books(), "chapter": store.chapters, "verse": store.verses, "latin": store.texts()})
+        embeddings = store.embeddings
+        version = store.version
+        for language in store.languages:
+            if store.translation_embeddings(language) is not None:
+                df[language] = store.texts(language)
+                translations[language] = store.translation_embeddings(language)
+    if embeddings is None:
+        parser.error(f"{args.store} has no embeddings")
+    build_local_index(df, embeddings, args.index_dir, args.quantization, args.pca_dims, version, translations)
+    print(f"Wrote {len(df)} verses to {args.index_dir}" + (f" with {', '.join(translations)} vectors" if translations else ""))
+
+if __name__ == "__main__":
+    main()
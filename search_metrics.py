@@ -0,0 +1,268 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Searches slower than this are appended to SLOW_QUERY_LOG; 0 disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "data/slow_queries.jsonl")
+# Port of the Prometheus scrape endpoint started by the apps and the query daemon; 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Seconds; covers a cache hit (well under 1 ms) up to a cold model load
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "vulgate_searches_total": ("counter", "Searches finished, by entry point and search mode."),
+    "vulgate_search_errors_total": ("counter", "Searches that failed, by entry point, stage and exception type."),
+    "vulgate_slow_searches_total": ("counter", "Searches slower than SLOW_QUERY_MS."),
+    "vulgate_search_seconds": ("histogram", "End-to-end search latency."),
+    "vulgate_search_stage_seconds": ("histogram", "Time spent in each stage of a search."),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile `q`; coarse, but enough to spot the slow stage."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class SearchMetrics:
+    """Counters and latency histograms shared by every search path in a process.
+
+    `render()` returns the Prometheus text exposition format, served by
+    `start_metrics_server` or written with `write(path)` for a textfile
+    collector.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in HELP.items():
+                counters = sorted((labels, v) for (n, labels), v in self._counters.items() if n == name)
+                histograms = sorted((labels, h) for (n, labels), h in self._histograms.items() if n == name)
+                if not counters and not histograms:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in counters:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+                for labels, h in histograms:
+                    cumulative = 0
+                    for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write `render()` to `path` atomically, e.g. for node_exporter's textfile collector."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def stage_summary(self, source=None):
+        """{stage: {n, mean_ms, p50_ms, p95_ms}} for the stage histograms, optionally of one entry point."""
+        summary = {}
+        with self._lock:
+            for (name, labels), h in sorted(self._histograms.items()):
+                labels = dict(labels)
+                if name != "vulgate_search_stage_seconds" or (source and labels.get("source") != source):
+                    continue
+                summary[labels["stage"] if source else f"{labels['source']}/{labels['stage']}"] = {
+                    "n": h.count,
+                    "mean_ms": h.sum / h.count * 1000,
+                    "p50_ms": h.quantile(0.5) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                }
+        return summary
+
+
+METRICS = SearchMetrics()
+_slow_log_lock = threading.Lock()
+
+
+class SearchTrace:
+    """Per-stage timing of one search.
+
+    Use as a context manager around the whole search and wrap each stage in
+    `with trace.stage("encode"):`. A stage that runs twice adds up. On exit
+    the total and every stage are recorded in `metrics`, an exception is
+    counted against the stage it escaped from, and a search slower than
+    `slow_ms` is appended to the slow-query log with its filters and stage
+    breakdown. Exceptions are never swallowed.
+    """
+
+    def __init__(self, source, query, metrics=METRICS, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_QUERY_LOG, **filters):
+        self.source = source
+        self.query = query
+        self.filters = filters
+        self.mode = "hybrid" if filters.get("hybrid") else "passages" if filters.get("passages") else "vector"
+        self.metrics = metrics
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.stages = {}
+        self.error = None
+        self.total = None
+        self._current = None
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.fail(exc)
+        self.finish()
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        outer, self._current = self._current, name
+        try:
+            yield
+        except BaseException as e:
+            self.fail(e)
+            raise
+        finally:
+            self._current = outer
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def fail(self, exc):
+        """Record `exc` against the running stage; only the first failure counts."""
+        if self.error is None:
+            self.error = {"stage": self._current or "other", "type": type(exc).__name__, "message": str(exc)}
+
+    def finish(self):
+        if self.total is not None:
+            return self.total
+        self.total = time.perf_counter() - self._started
+        m = self.metrics
+        m.inc("vulgate_searches_total", source=self.source, mode=self.mode)
+        m.observe("vulgate_search_seconds", self.total, source=self.source)
+        for name, seconds in self.stages.items():
+            m.observe("vulgate_search_stage_seconds", seconds, source=self.source, stage=name)
+        if self.error:
+            m.inc("vulgate_search_errors_total", source=self.source, stage=self.error["stage"], error=self.error["type"])
+        if self.slow_ms and self.total * 1000 >= self.slow_ms:
+            m.inc("vulgate_slow_searches_total", source=self.source)
+            self._log_slow()
+        return self.total
+
+    def breakdown(self):
+        parts = [f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.stages.items()]
+        total = self.total if self.total is not None else time.perf_counter() - self._started
+        return f"{total * 1000:.1f} ms ({', '.join(parts)})" if parts else f"{total * 1000:.1f} ms"
+
+    def _log_slow(self):
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "source": self.source,
+            "query": self.query,
+            "filters": self.filters,
+            "total_ms": round(self.total * 1000, 2),
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+        }
+        if self.error:
+            entry["error"] = self.error
+        try:
+            os.makedirs(os.path.dirname(self.slow_log) or ".", exist_ok=True)
+            with _slow_log_lock, open(self.slow_log, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            print(f"Could not write slow-query log {self.slow_log}: {e}", file=sys.stderr)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the app's own output
+
+
+_metrics_server = None
+
+
+def start_metrics_server(port=METRICS_PORT, metrics=METRICS, host="0.0.0.0"):
+    """Serve `metrics.render()` over HTTP on `port` from a daemon thread; once per process.
+
+    Returns the server, or None if `port` is 0.
+    """
+    global _metrics_server
+    if not port:
+        return None
+    if _metrics_server is None:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.daemon_threads = True
+        server.metrics = metrics
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Serving search metrics on http://{host}:{port}/metrics", file=sys.stderr)
+        _metrics_server = server
+    return _metrics_server
@@ -1,9 +1,10 @@
-from weaviate.classes.query import MetadataQuery
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-import weaviate
-from weaviate.auth import Auth
-from weaviate.collections.classes.filters import Filter
+from highlight import get_highlighter
+from languages import vector_weights
+from embedding_cache import EmbeddingCache
+from model_loader import MODEL_WARM_UP, LazyModel
+from search_backend import SEARCH_BACKEND, shared_backend
+from search_metrics import SearchTrace, start_metrics_server
 st.markdown("""
 <style>
 /* Import Google Fonts */
@@ -121,59 +122,93 @@ h1 {
 
 @st.cache_resource
 def load_model():
-    model = SentenceTransformer('sentence-transformers/LaBSE')
+    # Loaded on the first cache miss so the page renders without waiting for the weights
+    model = LazyModel()
+    if MODEL_WARM_UP:
+        model.warm_up_in_background()
     return model
 
-def find_similar(query, model, books=[]):
-    results = []
-    query_vector = model.encode([query])[0]
-    if books:
-        response = vulgate.query.near_vector(
-            near_vector=query_vector,
-            return_metadata=MetadataQuery(distance=True),
-            filters=Filter.by_property("book").contains_any(books)
-        )
-    else:
-        response = vulgate.query.near_vector(
-            near_vector=query_vector,
-            return_metadata=MetadataQuery(distance=True)
+@st.cache_resource
+def load_embedding_cache():
+    return EmbeddingCache(load_model())
+
+@st.cache_resource
+def load_backend():
+    if SEARCH_BACKEND == "weaviate":
+        return shared_backend(
+            "weaviate",
+            st.secrets["WEAVIATE_URL"],
+            st.secrets["WEAVIATE_API_KEY"],
+            st.secrets["COLLECTION_NAME"],
         )
+    return shared_backend(SEARCH_BACKEND)
 
-    for o in response.objects:
-        results.append({
-            "book": o.properties["book"],
-            "chapter": o.properties["chapter"],
-            "verse": o.properties["verse"],
-            "text": o.properties["text"],
-            "distance": o.metadata.distance
-        })
-    return results
+@st.cache_resource
+def metrics_server():
+    # Script reruns share the process, so one scrape endpoint serves every session
+    return start_metrics_server()
+
+def find_similar(query, embeddings, backend, books=[], hybrid=False, alpha=0.5, limit=10, offset=0, trace=None):
+    trace = trace or SearchTrace("streamlit", query)
+    with trace.stage("encode"):
+        query_vector = embeddings.encode_one(query)
+    weights = vector_weights(query, backend.languages)
+    with trace.stage("search"):
+        if hybrid:
+            return backend.hybrid_search(query, query_vector, limit=limit, books=books, alpha=alpha, offset=offset, weights=weights)
+        return backend.search(query_vector, limit=limit, books=books, offset=offset, weights=weights)
+
+def next_page():
+    st.session_state.page += 1
+
+def previous_page():
+    st.session_state.page -= 1
 
 vulgate_books = {"Genesis": "Gn", "Exodus": "Ex", "Leviticus": "Lv", "Numbers": "Nm", "Deuteronomy": "Dt", "Joshua": "Jos", "Judges": "Jdc", "Ruth": "Rt", "1 Samuel": "1Rg", "2 Samuel": "2Rg", "1 Kings": "3Rg", "2 Kings": "4Rg", "1 Chronicles": "1Par", "2 Chronicles": "2Par", "Ezra": "Esr", "Nehemiah": "Neh", "Tobit": "Tob", "Judith": "Jdt", "Esther": "Est", "1 Maccabees": "1Mcc", "2 Maccabees": "2Mcc", "Job": "Job", "Psalms": "Ps", "Proverbs": "Pr", "Ecclesiastes": "Ecl", "Song of Solomon": "Ct", "Wisdom": "Sap", "Sirach": "Sir", "Isaiah": "Is", "Jeremiah": "Jr", "Lamentations": "Lam", "Baruch": "Bar", "Ezekiel": "Ez", "Daniel": "Dn", "Hosea": "Os", "Joel": "Joel", "Amos": "Am", "Obadiah": "Abd", "Jonah": "Jon", "Micah": "Mch", "Nahum": "Nah", "Habakkuk": "Hab", "Zephaniah": "Soph", "Haggai": "Agg", "Zechariah": "Zach", "Malachi": "Mal", "Matthew": "Mt", "Mark": "Mc", "Luke": "Lc", "John": "Jo", "Acts": "Act", "Romans": "Rom", "1 Corinthians": "1Cor", "2 Corinthians": "2Cor", "Galatians": "Gal", "Ephesians": "Eph", "Philippians": "Phlp", "Colossians": "Col", "1 Thessalonians": "1Thes", "2 Thessalonians": "2Thes", "1 Timothy": "1Tim", "2 Timothy": "2Tim", "Titus": "Tit", "Philemon": "Phlm", "Hebrews": "Hbr", "James": "Jac", "1 Peter": "1Ptr", "2 Peter": "2Ptr", "1 John": "1Jo", "2 John": "2Jo", "3 John": "3Jo", "Jude": "Jud", "Revelation": "Apc"}
 
 
 st.title("Latin Vulgate Verse Similarity Search")
 
-model = load_model()
+embeddings = load_embedding_cache()
+metrics_server()
 
 
 query = st.text_input("Enter your search query:")
 books = st.multiselect("Select book(s)", vulgate_books.keys())
 select_books = [vulgate_books[book] for book in books]
+normalize = st.checkbox("Match Latin spelling variants (u/v, i/j, ae/e)")
+hybrid = st.checkbox("Hybrid search (keywords + meaning)")
+alpha = st.slider("Hybrid balance (0 = keywords only, 1 = meaning only)", 0.0, 1.0, 0.5, 0.05, disabled=not hybrid)
+page_size = st.selectbox("Results per page", [10, 25, 50, 100])
 
+# The search is kept in session state so the page buttons can re-run it at another offset
 if st.button("Search"):
-    with weaviate.connect_to_weaviate_cloud(
-        cluster_url=st.secrets["WEAVIATE_URL"],
-        auth_credentials=Auth.api_key(st.secrets["WEAVIATE_API_KEY"]),
-    ) as client:
-        vulgate = client.collections.get(st.secrets["COLLECTION_NAME"])
-        results = find_similar(query, model, select_books)
-        
-        if results:
-            st.subheader(f"Found {len(results)} similar verses:")
-            for i, result in enumerate(results, 1):
-                with st.expander(f"{i}. {result['book']} {result['chapter']}:{result['verse']} (Similarity: {1 - result['distance']:.2f})", expanded=True):
-                    st.markdown(f"<div class='bible-verse'>{result['text']}</div>", unsafe_allow_html=True)
-                    st.progress(1 - result['distance'])
-        else:
-            st.warning("No results found. Try adjusting your search query.")
\ No newline at end of file
+    st.session_state.search = (query, select_books, hybrid, alpha)
+    st.session_state.page = 0
+
+if "search" in st.session_state:
+    search_query, search_books, search_hybrid, search_alpha = st.session_state.search
+    offset = st.session_state.page * page_size
+    with SearchTrace("streamlit", search_query, books=search_books, limit=page_size, offset=offset,
+                     hybrid=search_hybrid, alpha=search_alpha, normalize=normalize) as trace:
+        with trace.stage("connect"):
+            backend = load_backend()
+        results = find_similar(search_query, embeddings, backend, search_books, search_hybrid, search_alpha, page_size, offset, trace)
+
+        with trace.stage("render"):
+            highlight = get_highlighter(search_query, normalize)
+            if results:
+                st.subheader(f"Similar verses {offset + 1}–{offset + len(results)}:")
+                for i, result in enumerate(results, offset + 1):
+                    with st.expander(f"{i}. {result['book']} {result['chapter']}:{result['verse']} (Similarity: {1 - result['distance']:.2f})", expanded=True):
+                        st.markdown(f"<div class='bible-verse'>{highlight(result['text'])}</div>", unsafe_allow_html=True)
+                        st.progress(min(max(1 - result['distance'], 0.0), 1.0))
+            elif offset:
+                st.info("No more results.")
+            else:
+                st.warning("No results found. Try adjusting your search query.")
+    previous_col, next_col = st.columns(2)
+    previous_col.button("Previous page", on_click=previous_page, disabled=st.session_state.page == 0)
+    next_col.button("Next page", on_click=next_page, disabled=len(results) < page_size)
+    st.caption("Embedding cache: {hits} hits, {disk_hits} disk hits, {misses} misses".format(**embeddings.stats())
+               + f" · search took {trace.breakdown()}")
\ No newline at end of file
@@ -0,0 +1,58 @@
+import io
+from detect_citations import iter_raw_sentences, iter_sentences
+
+
+class Reader(io.StringIO):
+    """StringIO that records the largest read, to check the document is never read whole."""
+
+    def __init__(self, text):
+        super().__init__(text, newline="")
+        self.largest = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest = max(self.largest, len(data))
+        return data
+
+
+def sentences(text, **kwargs):
+    return [s["sentence"] for s in iter_sentences(Reader(text), **kwargs)]
+
+
+def test_offsets_point_into_the_document():
+    text = "Title line\n\n  In principio erat Verbum.  Et Verbum erat apud Deum!\n\nFiat lux"
+    found = list(iter_sentences(io.StringIO(text, newline=""), min_chars=1))
+    assert [s["sentence"] for s in found] == ["Title line", "In principio erat Verbum.", "Et Verbum erat apud Deum!", "Fiat lux"]
+    assert all(text[s["start"]:s["end"]] == s["sentence"] for s in found)
+
+
+def test_crlf_offsets():
+    text = "Prima linea\r\nsecunda linea.\r\n\r\nEcce agnus Dei.\r\n"
+    found = list(iter_sentences(io.StringIO(text, newline=""), min_chars=1))
+    assert [s["sentence"] for s in found] == ["Prima linea secunda linea.", "Ecce agnus Dei."]
+    assert [text[s["start"]:s["end"]] for s in found] == ["Prima linea\r\nsecunda linea.", "Ecce agnus Dei."]
+
+
+def test_sentences_are_not_cut_at_chunk_boundaries():
+    text = " ".join(f"Sententia numero {i} quae satis longa est." for i in range(500))
+    fh = Reader(text)
+    found = list(iter_raw_sentences(fh, read_chars=97))
+    assert fh.largest == 97  # the document (no newlines at all) is never read in one piece
+    assert len(found) == 500
+    assert all(text[start:start + len(raw)] == raw for start, raw in found)
+    # Closing quotes after the punctuation stay with their sentence across a boundary
+    text = "Dixit: «Ecce homo.» Alia sententia hic."
+    found = [raw.strip() for _, raw in iter_raw_sentences(Reader(text), read_chars=len("Dixit: «Ecce homo."))]
+    assert found == ["Dixit: «Ecce homo.»", "Alia sententia hic."]
+
+
+def test_unpunctuated_text_is_cut_at_a_space():
+    text = "verbum " * 1000
+    found = list(iter_raw_sentences(Reader(text), read_chars=100, max_chars=500))
+    assert max(len(raw) for _, raw in found) <= 500
+    assert all(raw.endswith(" ") for _, raw in found)  # never mid-word
+    assert "".join(raw for _, raw in found) == text
+
+
+def test_min_chars():
+    assert sentences("Ita. Amen amen dico vobis.") == ["Amen amen dico vobis."]
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+
+class CountingModel:
+    model_id = "test-model"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.stack([np.full(4, len(t), dtype=np.float32) for t in texts])
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return {text for (text,) in db.execute("SELECT text FROM embeddings")}
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    model = CountingModel()
+    cache = EmbeddingCache(model, path=path)
+    vectors = cache.encode(["in principio", "In  principio ", "fiat lux"])
+    assert model.encoded == ["In principio", "fiat lux", "in principio"]  # whitespace only; LaBSE is cased
+    assert vectors.shape == (3, 4)
+    cache.encode_one("fiat lux")
+    assert cache.stats()["hits"] == 1
+    cache.close()
+
+    # Another process sharing the file gets disk hits
+    other = EmbeddingCache(CountingModel(), path=path)
+    other.encode_one("fiat lux")
+    assert other.stats()["disk_hits"] == 1 and other.model.encoded == []
+    other.close()
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(CountingModel(), maxsize=0, path=path, disk_maxsize=3)
+    for text in ["a", "b", "c"]:
+        cache.encode_one(text)
+        time.sleep(0.01)
+    cache.encode_one("a")  # a disk hit makes "a" recently used
+    time.sleep(0.01)
+    cache.encode_one("d")
+    assert rows(path) == {"a", "c", "d"}
+    assert cache.stats()["disk_evictions"] == 1
+    cache.encode(["e", "f"])
+    assert len(rows(path)) == 3
+    cache.close()
+
+
+def test_files_without_last_used_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE embeddings (model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, text))")
+        db.execute("INSERT INTO embeddings VALUES ('test-model', 'old', ?)", (np.zeros(4, np.float32).tobytes(),))
+    cache = EmbeddingCache(CountingModel(), maxsize=0, path=path, disk_maxsize=1)
+    assert cache.encode_one("old").tolist() == [0, 0, 0, 0]
+    cache.encode_one("new")
+    assert rows(path) == {"new"}
+    cache.close()
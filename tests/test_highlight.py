@@ -0,0 +1,66 @@
+import re
+import pytest
+from highlight import EXACT_STYLE, PARTIAL_STYLE, get_highlighter, highlight_matching_words, normalize_latin
+
+
+def reference_highlight(text, query):
+    """highlight_matching_words as app.py had it before the precompiled Highlighter."""
+    if not query.strip():
+        return text
+    query_words = set(re.findall(r'\b\w+\b', query.lower()))
+    if not query_words:
+        return text
+    partial_pattern = re.compile(r'(' + '|'.join(re.escape(w) for w in query_words) + r')', re.IGNORECASE)
+    tokens = re.findall(r'\w+|\W+', text)
+    highlighted = []
+    for token in tokens:
+        token_lc = token.lower()
+        if token_lc in query_words:
+            highlighted.append(f'<span style="background:yellow">{token}</span>')
+        elif token.strip() and token.isalpha() and any(w in token_lc and w != token_lc for w in query_words):
+            highlighted.append(partial_pattern.sub(lambda m: f'<span style="background:lightgreen">{m.group(0)}</span>', token))
+        else:
+            highlighted.append(token)
+    return ''.join(highlighted)
+
+
+VERSES = [
+    "In principio creavit Deus caelum et terram.",
+    "Terra autem erat inanis et vacua, et tenebrae erant super faciem abyssi: et spiritus Dei ferebatur super aquas.",
+    "Dixitque Deus: Fiat lux. Et facta est lux.",
+    "Beati pauperes spiritu, quoniam ipsorum est regnum caelorum.",
+    "Et Verbum caro factum est, et habitavit in nobis 3 dies.",
+]
+
+
+@pytest.mark.parametrize("query", [
+    "deus", "Lux", "terra", "spiritus caelum", "fact", "est regnum", "super aquas!", "caro 3", "   ", "?!", "nihil",
+])
+def test_plain_queries_match_the_old_highlighter(query):
+    for verse in VERSES:
+        assert highlight_matching_words(verse, query) == reference_highlight(verse, query)
+
+
+def test_exact_and_partial_spans():
+    html = highlight_matching_words("Et Verbum caro factum est", "verbum fact")
+    assert f'<span style="{EXACT_STYLE}">Verbum</span>' in html
+    assert f'<span style="{PARTIAL_STYLE}">fact</span>um' in html
+    # Overlapping query words: the longest match wins at a position
+    assert highlight_matching_words("terram", "ter terra") == f'<span style="{PARTIAL_STYLE}">terra</span>m'
+
+
+def test_normalize_folds_latin_spelling_variants():
+    assert normalize_latin("Vult") == normalize_latin("uult") == "uult"
+    assert normalize_latin("caelum") == normalize_latin("cœlum") == "celum"
+    text = "Iesus dixit: uenite ad me, et cælum aperietur."
+    html = highlight_matching_words(text, "Jesus venite caelum", normalize=True)
+    for word in ["Iesus", "uenite", "cælum"]:
+        assert f'<span style="{EXACT_STYLE}">{word}</span>' in html
+    assert highlight_matching_words(text, "Jesus venite caelum") == text  # no folding without normalize
+    partial = highlight_matching_words("iustitiam", "justit", normalize=True)
+    assert partial == f'<span style="{PARTIAL_STYLE}">iustit</span>iam'
+
+
+def test_highlighters_are_compiled_once_per_query():
+    assert get_highlighter("lux", True) is get_highlighter("lux", True)
+    assert get_highlighter("lux", True) is not get_highlighter("lux", False)
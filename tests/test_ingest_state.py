@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+import main
+from search_backend import LocalBackend, build_local_index
+from benchmarks.fixtures import DIM, FakeModel, MockCollection, _MockBatch, _MockBatchWrapper, synthetic_verses
+
+
+class FailingCollection(MockCollection):
+    """Stores the first `accept` objects, then fails every upload like a dropped connection."""
+
+    def __init__(self, accept):
+        super().__init__()
+        self.accept = accept
+        self.batch = _FailingBatchWrapper(self)
+
+
+class _FailingBatch(_MockBatch):
+    def add_object(self, **kwargs):
+        if len(self.collection.objects) >= self.collection.accept:
+            raise ConnectionError("connection reset")
+        return super().add_object(**kwargs)
+
+
+class _FailingBatchWrapper(_MockBatchWrapper):
+    def fixed_size(self, batch_size=100, concurrent_requests=2):
+        return _FailingBatch(self.collection, batch_size)
+
+
+class CountingModel(FakeModel):
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.encoded.extend(texts)
+        return super().encode(texts, batch_size, **kwargs)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "verses.csv"
+    synthetic_verses(50).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = main.IngestState(str(tmp_path / "state.sqlite"))
+    yield state
+    state.close()
+
+
+def test_rerun_skips_unchanged_verses(csv_path, state):
+    uploaded, _ = main.ingest(csv_path, CountingModel(), MockCollection(), state, chunk_size=20)
+    assert uploaded == 50 and state.checkpoint == 0
+
+    model = CountingModel()
+    assert main.ingest(csv_path, model, MockCollection(), state, chunk_size=20)[0] == 0
+    assert model.encoded == []
+
+    df = synthetic_verses(50)
+    df.loc[33, "latin"] = "fiat lux"
+    df.to_csv(csv_path, index=False)
+    collection = MockCollection()
+    assert main.ingest(csv_path, model, collection, state, chunk_size=20)[0] == 1
+    assert model.encoded == ["fiat lux"]
+    assert [p["text"] for p, _ in collection.objects.values()] == ["fiat lux"]
+
+
+def test_interrupted_run_resumes_after_last_chunk(csv_path, state):
+    with pytest.raises(ConnectionError):
+        main.ingest(csv_path, FakeModel(), FailingCollection(accept=25), state, chunk_size=20, batch_size=5)
+    assert state.checkpoint == 20  # the second chunk failed halfway and was not recorded
+
+    model = CountingModel()
+    collection = MockCollection()
+    uploaded, _ = main.ingest(csv_path, model, collection, state, chunk_size=20)
+    assert uploaded == 30 and len(model.encoded) == 30
+    assert state.checkpoint == 0
+
+    df, embeddings, _ = state.export()
+    assert len(df) == 50 and embeddings.shape == (50, DIM)
+    expected = synthetic_verses(50)
+    assert df.latin.tolist() == expected.latin.tolist()
+    np.testing.assert_allclose(embeddings, FakeModel().encode(expected.latin.tolist()))
+
+
+def test_reset_forgets_uploaded_verses(csv_path, state):
+    main.ingest(csv_path, FakeModel(), MockCollection(), state, chunk_size=20)
+    state.version = "v1"
+    state.reset()
+    assert state.version is None
+    model = CountingModel()
+    assert main.ingest(csv_path, model, MockCollection(), state, chunk_size=20)[0] == 50
+    assert len(model.encoded) == 50
+
+
+class DescribedCollection(MockCollection):
+    """MockCollection that also records `config.update(description=...)`."""
+
+    def __init__(self):
+        super().__init__()
+        self.description = None
+        self.config = self
+
+    def update(self, description):
+        self.description = description
+
+
+def test_version_is_bumped_after_an_interrupted_run_that_left_nothing_to_upload(csv_path, state):
+    collection = DescribedCollection()
+    main.ingest(csv_path, FakeModel(), collection, state, chunk_size=20)
+    first = main.publish_version(state, collection)
+    assert collection.description == f"{main.INGEST_VERSION_PREFIX}{first}"
+    assert main.publish_version(state, collection) == first  # nothing changed
+
+    # An edited verse is upserted, then the run dies before it publishes a version
+    df = synthetic_verses(50)
+    df.loc[23, "latin"] = "fiat lux"
+    df.to_csv(csv_path, index=False)
+    assert main.ingest(csv_path, FakeModel(), collection, state, chunk_size=20)[0] == 1
+    assert state.dirty
+
+    # The re-run has nothing left to upload but must still publish the change
+    assert main.ingest(csv_path, FakeModel(), collection, state, chunk_size=20)[0] == 0
+    second = main.publish_version(state, collection)
+    assert second != first and collection.description.endswith(second)
+    assert not state.dirty
+
+
+def test_local_only_run_builds_the_local_index_without_weaviate(tmp_path, csv_path, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    monkeypatch.setattr(main, "LazyModel", FakeModel)
+    monkeypatch.setattr(main, "VERSE_STORE_PATH", str(tmp_path / "verses.store"))
+    monkeypatch.setattr(main, "LOCAL_INDEX_DIR", index_dir)
+    monkeypatch.setattr(main, "build_local_index", lambda *a, **kw: build_local_index(*a, index_dir=index_dir, **kw))
+    monkeypatch.setattr(main.weaviate, "connect_to_weaviate_cloud", None)  # any connection attempt fails
+    state_path = str(tmp_path / "state.sqlite")
+    monkeypatch.setattr("sys.argv", ["main.py", "--csv", csv_path, "--state", state_path, "--local-only", "--passage-windows", "none"])
+    main.main()
+
+    backend = LocalBackend(index_dir)
+    assert len(backend) == 50 and backend.version()
+    state = main.IngestState(state_path)
+    try:
+        assert state.local_only and not state.dirty
+    finally:
+        state.close()
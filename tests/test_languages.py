@@ -0,0 +1,38 @@
+import pytest
+from languages import PRIMARY_LANGUAGE, detect_language, vector_weights
+
+INDEXED = [PRIMARY_LANGUAGE, "english"]
+
+
+def test_detect_language():
+    assert detect_language("Et dixit Deus fiat lux et facta est lux") == "latin"
+    assert detect_language("And God said, Let there be light: and there was light") == "english"
+    assert detect_language("Und Gott sprach: Es werde Licht") == "german"
+    assert detect_language("fiat lux") is None
+    assert detect_language("And God said", candidates=["latin"]) is None
+
+
+def test_single_vector_index_always_searches_latin():
+    assert vector_weights("And God said", [PRIMARY_LANGUAGE]) is None
+    assert vector_weights("And God said", [PRIMARY_LANGUAGE], "all") is None
+
+
+def test_auto_picks_the_detected_language():
+    assert vector_weights("Et dixit Deus fiat lux", INDEXED) is None
+    assert vector_weights("And God said, Let there be light", INDEXED) == {"english": 1.0}
+
+
+def test_auto_falls_back_to_latin_when_inconclusive():
+    # Short Latin phrases without function words are the common query
+    assert vector_weights("fiat lux", INDEXED) is None
+    assert vector_weights("Vanitas vanitatum", INDEXED) is None
+    # A language the index has no vectors for
+    assert vector_weights("Und Gott sprach: Es werde Licht", INDEXED) is None
+
+
+def test_forced_language_and_all():
+    assert vector_weights("fiat lux", INDEXED, "english") == {"english": 1.0}
+    assert vector_weights("And God said", INDEXED, "latin") is None
+    assert vector_weights("fiat lux", INDEXED, "all") == {"latin": 0.5, "english": 0.5}
+    with pytest.raises(ValueError):
+        vector_weights("fiat lux", INDEXED, "german")
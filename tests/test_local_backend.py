@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from search_backend import LocalBackend, build_local_index
+
+WORDS = "deus dominus caelum terra lux aqua spiritus verbum panis vita mors pax".split()
+
+
+def make_verses(n=240, dim=32, seed=0):
+    """Verses in three books, with embeddings close to an 8-dimensional subspace as real sentence embeddings are."""
+    rng = np.random.default_rng(seed)
+    books = np.repeat(["Gn", "Ex", "Mt"], n // 3)
+    df = pd.DataFrame({
+        "book": books,
+        "chapter": np.tile(np.repeat(np.arange(1, 5), n // 12), 3),
+        "verse": np.tile(np.arange(1, n // 12 + 1), 12),
+        "latin": [" ".join(rng.choice(WORDS, 6)) for _ in range(n)],
+    })
+    embeddings = rng.standard_normal((n, 8)) @ rng.standard_normal((8, dim)) + 0.05 * rng.standard_normal((n, dim))
+    return df, embeddings.astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def verses():
+    return make_verses()
+
+
+@pytest.fixture(scope="module", params=["none", "int8", "pca"])
+def backend(request, verses, tmp_path_factory):
+    df, embeddings = verses
+    index_dir = tmp_path_factory.mktemp(request.param)
+    build_local_index(df, embeddings, str(index_dir), request.param, dims=7)  # lossy, so unrescored PCA scores would misrank
+    return LocalBackend(str(index_dir))
+
+
+def exact_ranking(verses, query, books=None):
+    df, embeddings = verses
+    e = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    sims = e @ (query / np.linalg.norm(query))
+    if books:
+        sims = np.where(df["book"].isin(books), sims, -np.inf)
+    order = np.argsort(-sims, kind="stable")
+    return [(df["book"][i], int(df["chapter"][i]), int(df["verse"][i])) for i in order], sims[order]
+
+
+def keys(hits):
+    return [(h["book"], h["chapter"], h["verse"]) for h in hits]
+
+
+def test_search_matches_exact_ranking(backend, verses):
+    query = verses[1][17] + 0.1
+    expected, sims = exact_ranking(verses, query)
+    hits = backend.search(query, limit=5)
+    assert keys(hits) == expected[:5]
+    # Quantized indexes report the rescored, exact distances
+    np.testing.assert_allclose([h["distance"] for h in hits], 1 - sims[:5], atol=1e-5)
+
+
+def test_book_filter_and_distance(backend, verses):
+    query = verses[1][100]
+    expected, _ = exact_ranking(verses, query, books=["Ex"])
+    assert keys(backend.search(query, limit=3, books=["Ex"])) == expected[:3]
+    assert backend.search(query, books=["Nonexistent"]) == []
+    hits = backend.search(query, limit=20, distance=0.5)
+    assert hits and all(h["distance"] < 0.5 for h in hits)
+
+
+def test_search_batch_matches_search(backend, verses):
+    queries = verses[1][[3, 90, 200]]
+    batch = backend.search_batch(queries, limit=4)
+    assert [keys(h) for h in batch] == [keys(backend.search(q, limit=4)) for q in queries]
+
+
+def test_pages_continue_the_ranking(backend, verses):
+    query = verses[1][61]
+    expected, _ = exact_ranking(verses, query, books=["Gn", "Mt"])
+    pages = [backend.search(query, limit=7, books=["Gn", "Mt"], offset=offset) for offset in (0, 7, 14)]
+    assert [k for page in pages for k in keys(page)] == expected[:21]
+    # The last page of the 160 Gn and Mt verses comes back short
+    assert keys(backend.search(query, limit=7, books=["Gn", "Mt"], offset=157)) == expected[157:160]
+    hybrid = backend.hybrid_search("lux aqua", query, limit=14)
+    assert keys(backend.hybrid_search("lux aqua", query, limit=7, offset=7)) == keys(hybrid[7:])
+
+
+def test_hybrid_alpha_one_is_vector_ranking(backend, verses):
+    query = verses[1][42]
+    expected, _ = exact_ranking(verses, query)
+    for fusion in ["alpha", "rrf"]:
+        hits = backend.hybrid_search("lux aqua", query, limit=5, alpha=1.0, fusion=fusion)
+        assert keys(hits) == expected[:5]
+
+
+def test_hybrid_alpha_zero_is_lexical_ranking(backend, verses):
+    df, embeddings = verses
+    text = df["latin"][7]
+    scores = backend.bm25.scores(text)
+    best = np.flatnonzero(scores == scores.max())
+    hits = backend.hybrid_search(text, embeddings[0], limit=1, alpha=0.0)
+    assert backend.row(int(best[0]))["text"] == hits[0]["text"] or len(best) > 1
+    assert hits[0]["distance"] == pytest.approx(0.0)
+
+
+def test_hybrid_rrf_is_the_same_on_every_quantization(backend, verses, tmp_path_factory):
+    df, embeddings = verses
+    exact_dir = tmp_path_factory.mktemp("exact")
+    build_local_index(df, embeddings, str(exact_dir))
+    exact = LocalBackend(str(exact_dir))
+    query = embeddings[150] + 0.2 * embeddings[3]
+    hits = backend.hybrid_search("verbum vita", query, limit=5, fusion="rrf")
+    expected = exact.hybrid_search("verbum vita", query, limit=5, fusion="rrf")
+    # The toy vocabulary makes fused-score ties common, and ties may come back in either order
+    np.testing.assert_allclose([h["distance"] for h in hits], [h["distance"] for h in expected], atol=1e-5)
+
+
+def test_unknown_fusion(backend, verses):
+    with pytest.raises(ValueError):
+        backend.hybrid_search("lux", verses[1][0], fusion="max")
+
+
+def test_rebuild_is_picked_up_without_touching_the_loaded_arrays(tmp_path):
+    df, embeddings = make_verses(seed=1)
+    build_local_index(df, embeddings, str(tmp_path), version="v1")
+    backend = LocalBackend(str(tmp_path))
+    loaded = np.array(backend.vectors)
+
+    # A smaller index with other verses, as after an ingestion that dropped a book
+    df2, embeddings2 = make_verses(n=120, seed=2)
+    build_local_index(df2, embeddings2, str(tmp_path), version="v2")
+    np.testing.assert_array_equal(backend.vectors, loaded)  # the old memory map still reads the old file
+
+    assert backend.version() == "v2"
+    assert len(backend) == 120
+    query = embeddings2[5]
+    assert keys(backend.search(query, limit=3)) == exact_ranking((df2, embeddings2), query)[0][:3]
+    assert backend.refresh() is False
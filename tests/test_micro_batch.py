@@ -0,0 +1,67 @@
+import threading
+import pytest
+from micro_batch import MicroBatcher
+
+
+class GatedFn:
+    """Batch function whose first call blocks until released, so later items pile up in the queue."""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if len(self.batches) == 1:
+            self.started.set()
+            self.release.wait(5)
+        if "bad" in items:
+            raise ValueError("cannot encode")
+        return [item.upper() for item in items]
+
+
+def test_queued_items_are_batched_up_to_max_batch():
+    fn = GatedFn()
+    batcher = MicroBatcher(fn, max_batch=3, max_wait=0)
+    try:
+        first = batcher.submit("a")
+        assert fn.started.wait(5)
+        futures = [batcher.submit(item) for item in "bcdef"]
+        fn.release.set()
+        assert first.result(5) == "A"
+        assert [f.result(5) for f in futures] == list("BCDEF")  # each caller gets its own result
+        assert fn.batches == [["a"], ["b", "c", "d"], ["e", "f"]]
+        stats = batcher.stats()
+        assert (stats["batches"], stats["items"], stats["max_batch_size"]) == (3, 6, 3)
+    finally:
+        batcher.close()
+
+
+def test_a_failing_batch_fails_its_callers_only():
+    fn = GatedFn()
+    batcher = MicroBatcher(fn, max_batch=8, max_wait=0)
+    try:
+        batcher.submit("a")
+        assert fn.started.wait(5)
+        failing = [batcher.submit(item) for item in ["x", "bad"]]
+        fn.release.set()
+        for future in failing:
+            with pytest.raises(ValueError, match="cannot encode"):
+                future.result(5)
+        assert batcher("y") == "Y"  # the worker keeps serving
+    finally:
+        batcher.close()
+
+
+def test_close_finishes_queued_items_then_refuses_new_ones():
+    fn = GatedFn()
+    batcher = MicroBatcher(fn, max_batch=8, max_wait=0)
+    batcher.submit("a")
+    assert fn.started.wait(5)
+    pending = batcher.submit("b")
+    fn.release.set()
+    batcher.close()
+    assert pending.result(0) == "B"
+    with pytest.raises(RuntimeError):
+        batcher.submit("c")
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from passages import build_passage_index, passage_index_is_current
+from search_backend import LocalBackend, build_local_index
+from test_local_backend import make_verses
+
+
+class HashModel:
+    """Deterministic stand-in for LaBSE: the same text always gets the same vector."""
+
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(32) for t in texts]).astype(np.float32)
+
+
+def test_passage_index_rebuilt_only_for_a_new_version(tmp_path):
+    df, embeddings = make_verses()
+    index_dir = str(tmp_path)
+    build_local_index(df, embeddings, index_dir, version="v1")
+    assert not passage_index_is_current(index_dir, "v1", [2, 3])
+    index = build_passage_index(index_dir, HashModel(), [2, 3], cache_path=str(tmp_path / "cache.sqlite"))
+    assert passage_index_is_current(index_dir, "v1", [2, 3])
+    assert not passage_index_is_current(index_dir, "v2", [2, 3])
+    assert not passage_index_is_current(index_dir, "v1", [2, 3, 4])
+
+    # A passage's own embedding finds it as one span
+    start, n = int(index.starts[5]), int(index.lengths[5])
+    hit = LocalBackend(index_dir).passage_search(index.vectors[5], limit=1)[0]
+    assert (hit["verse"], hit["verse_end"]) == (int(df["verse"][start]), int(df["verse"][start + n - 1]))
+    assert hit["text"] == " ".join(df["latin"][start:start + n])
+
+
+def test_passages_of_a_previous_ingestion_are_not_searched(tmp_path):
+    df, embeddings = make_verses()
+    index_dir = str(tmp_path)
+    build_local_index(df, embeddings, index_dir, version="v1")
+    build_passage_index(index_dir, HashModel(), [2], cache_path=str(tmp_path / "cache.sqlite"))
+    # main.py has rebuilt the verses but not yet the passages
+    build_local_index(df, embeddings, index_dir, version="v2")
+    with pytest.raises(RuntimeError, match="another ingestion"):
+        LocalBackend(index_dir).passage_search(embeddings[0])
@@ -0,0 +1,76 @@
+import sys
+import threading
+import numpy as np
+import pytest
+import query
+from query_daemon import QueryClient, QueryServer, QueryService
+from search_backend import LocalBackend, build_local_index
+from test_local_backend import make_verses
+
+
+class Embeddings:
+    """EmbeddingCache stand-in: the query "row N" encodes to the embedding of row N."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts, **kwargs):
+        return np.stack([self.vectors[int(t.split()[-1])] for t in texts])
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    df, embeddings = make_verses()
+    build_local_index(df, embeddings, str(tmp_path / "index"))
+    service = QueryService(Embeddings(embeddings), LocalBackend(str(tmp_path / "index")))
+    path = str(tmp_path / "query.sock")
+    server = QueryServer(path, service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path, df
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def test_daemon_search_and_stats(daemon):
+    path, df = daemon
+    client = QueryClient.connect(path)
+    try:
+        hit = client.search("row 7", limit=1)[0]
+        assert (hit["book"], hit["chapter"], hit["verse"]) == (df["book"][7], df["chapter"][7], df["verse"][7])
+        second_page = client.search("row 7", limit=2, offset=1)
+        assert [h["text"] for h in client.search("row 7", limit=3)][1:] == [h["text"] for h in second_page]
+        stats = client.stats()
+        assert stats["backend"] == "local" and stats["languages"] == ["latin"]
+    finally:
+        client.close()
+
+
+def run_cli(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["query.py", *argv])
+    query.main()
+
+
+def test_cli_forwards_only_to_a_daemon_of_the_same_backend(daemon, monkeypatch, capsys):
+    path, df = daemon
+    run_cli(monkeypatch, "row 7", "--socket", path, "--backend", "local", "--threshold", "0.01", "--limit", "1")
+    assert df["latin"][7] in capsys.readouterr().out
+
+    # A Weaviate search must not be answered by the local daemon
+    monkeypatch.setenv("WEAVIATE_URL", "")
+    monkeypatch.setattr(query, "load_dotenv", lambda: None)
+    with pytest.raises(SystemExit):
+        run_cli(monkeypatch, "row 7", "--socket", path, "--backend", "weaviate")
+    captured = capsys.readouterr()
+    assert "serves the local backend, not weaviate" in captured.err
+    assert df["latin"][7] not in captured.out
+
+
+def test_cli_checks_language_against_the_daemon(daemon, monkeypatch, capsys):
+    path, _ = daemon
+    with pytest.raises(SystemExit):
+        run_cli(monkeypatch, "row 7", "--socket", path, "--backend", "local", "--language", "english")
+    assert "no english vectors" in capsys.readouterr().out
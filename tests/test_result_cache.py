@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from result_cache import ResultCache, search_key
+from search_backend import INGEST_VERSION_PREFIX, WeaviateBackend
+
+
+class Version:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def test_longer_ranking_answers_shorter_limit():
+    cache = ResultCache()
+    key = search_key("In principio", ["Gn"])
+    cache.put(key, list(range(50)), 50)
+    assert cache.get(key, 10) == list(range(10))
+    assert cache.get(key, 100) is None
+    # A list shorter than its limit is the complete result set
+    cache.put(key, [1, 2], 10)
+    assert cache.get(key, 100) is None  # the 50-row entry was kept
+    cache.put(search_key("rare"), [1, 2], 10)
+    assert cache.get(search_key("rare"), 100) == [1, 2]
+
+
+def test_key_normalizes_query_and_books():
+    assert search_key("  In  principio ", ["Jn", "Gn"]) == search_key("In principio", ["Gn", "Jn"])
+    assert search_key("in principio") != search_key("In principio")  # LaBSE is cased
+    assert search_key("x", hybrid=True) != search_key("x")
+
+
+def test_version_change_invalidates():
+    version = Version("1")
+    cache = ResultCache(version=version, version_check=0)
+    key = search_key("q")
+    cache.check_version()
+    cache.put(key, ["hit"], 10)
+    assert cache.get(key, 10) == ["hit"]
+    version.value = "2"
+    assert cache.get(key, 10) == ["hit"]  # lookups never check the version themselves
+    cache.check_version()
+    assert cache.get(key, 10) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["version"] == "2"
+
+
+def test_version_checked_at_most_every_interval():
+    version = Version("1")
+    cache = ResultCache(version=version, version_check=3600)
+    for _ in range(5):
+        cache.check_version()
+    assert version.calls == 1
+
+
+def test_failing_version_is_counted_and_retried_after_a_backoff(capsys, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("result_cache.time.monotonic", lambda: clock[0])
+    version = Version(RuntimeError("backend down"))
+    cache = ResultCache(version=version, version_check=3600, version_retry=5)
+    cache.check_version()
+    cache.check_version()
+    # A backend that is down is not asked again on every search
+    assert version.calls == 1
+    assert cache.stats()["version_errors"] == 1
+    assert "backend down" in capsys.readouterr().err
+    # but a recovered one is noticed after the retry delay rather than the full interval
+    version.value = "1"
+    clock[0] += 5
+    cache.check_version()
+    assert version.calls == 2
+    assert cache.stats()["version"] == "1"
+
+
+def test_weaviate_version_reads_collection_description(monkeypatch):
+    config = SimpleNamespace(get=lambda: SimpleNamespace(description=f"{INGEST_VERSION_PREFIX}2024-01-01"))
+    monkeypatch.setattr(WeaviateBackend, "collection", property(lambda self: SimpleNamespace(config=config)))
+    backend = WeaviateBackend("http://localhost", "key", "Vulgate")
+    assert backend.version() == "2024-01-01"
+    # What the app hands to ResultCache
+    cache = ResultCache(version=backend.version, version_check=0)
+    cache.check_version()
+    assert cache.stats()["version"] == "2024-01-01"
+    assert cache.stats()["version_errors"] == 0
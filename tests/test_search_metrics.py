@@ -0,0 +1,50 @@
+from search_metrics import LATENCY_BUCKETS, Histogram, SearchMetrics
+
+
+def test_bucket_bounds_are_inclusive():
+    h = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 2.0):
+        h.observe(value)
+    # A value equal to a bound counts in that bucket (Prometheus `le`), larger ones go to +Inf
+    assert h.counts == [2, 2, 1]
+    assert h.count == 5 and h.sum == 3.65
+    assert h.quantile(0.4) == 0.1
+    assert h.quantile(0.8) == 1.0
+    assert h.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_render_is_prometheus_text_format():
+    metrics = SearchMetrics()
+    metrics.inc("vulgate_searches_total", source="cli", mode="vector")
+    metrics.inc("vulgate_searches_total", 2, source="cli", mode="vector")
+    metrics.inc("vulgate_search_errors_total", source="gradio", stage="search", error='Say "why"\n')
+    for seconds in (0.0005, 0.003, 0.003, 100.0):
+        metrics.observe("vulgate_search_seconds", seconds, source="cli")
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE vulgate_searches_total counter" in lines
+    assert 'vulgate_searches_total{mode="vector",source="cli"} 3' in lines
+    assert 'vulgate_search_errors_total{error="Say \\"why\\"\\n",source="gradio",stage="search"} 1' in lines
+    assert "# TYPE vulgate_search_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("vulgate_search_seconds_bucket")]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    # Cumulative counts, keyed on the inclusive upper bound
+    assert 'vulgate_search_seconds_bucket{source="cli",le="0.0005"} 1' in buckets
+    assert 'vulgate_search_seconds_bucket{source="cli",le="0.0025"} 1' in buckets
+    assert 'vulgate_search_seconds_bucket{source="cli",le="0.005"} 3' in buckets
+    assert 'vulgate_search_seconds_bucket{source="cli",le="30.0"} 3' in buckets
+    assert buckets[-1] == 'vulgate_search_seconds_bucket{source="cli",le="+Inf"} 4'
+    assert 'vulgate_search_seconds_count{source="cli"} 4' in lines
+    assert 'vulgate_search_seconds_sum{source="cli"} 100.0065' in lines
+    # Metrics with no samples are left out entirely
+    assert not any("vulgate_search_stage_seconds" in line for line in lines)
+
+
+def test_write_replaces_the_file(tmp_path):
+    metrics = SearchMetrics()
+    metrics.inc("vulgate_slow_searches_total", source="daemon")
+    path = tmp_path / "metrics" / "vulgate.prom"
+    metrics.write(str(path))
+    assert path.read_text() == metrics.render()
+    assert list(path.parent.iterdir()) == [path]
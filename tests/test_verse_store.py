@@ -0,0 +1,46 @@
+import sys
+import numpy as np
+import search_backend
+from search_backend import LocalBackend
+from verse_store import VerseStore
+
+
+def build_store(path, version=None):
+    rng = np.random.default_rng(0)
+    books = ["Gn"] * 4 + ["Ex"] * 3
+    chapters = [1, 1, 2, 2, 1, 1, 1]
+    verses = [1, 2, 1, 2, 1, 2, 3]
+    texts = ["In principio", "terra autem", "Igitur perfecti", "complevitque Deus", "Haec sunt nomina", "Ruben", "Ægyptum"]
+    english = ["In the beginning", "And the earth", "So the heavens", "And on the seventh", "These are the names", "Reuben", "Egypt"]
+    VerseStore.build(path, books, chapters, verses, texts, rng.standard_normal((7, 8)),
+                     translations={"english": (english, rng.standard_normal((7, 8)))}, version=version)
+    return VerseStore(path)
+
+
+def test_lookup_and_text(tmp_path):
+    store = build_store(str(tmp_path / "v.store"), version="v1")
+    assert len(store) == 7
+    assert store.get("Gn", 2, 2)["text"] == "complevitque Deus"
+    assert store.get("Ex", 1, 3)["text"] == "Ægyptum"
+    assert store.get("Ex", 2, 1) is None and store.get("Lv", 1, 1) is None
+    assert [v["verse"] for v in store.context("Gn", 2, 1)] == [1, 2]  # stops at the chapter boundary
+    assert store.version == "v1"
+    assert store.languages == ["english"]
+    assert store.text(6, "english") == "Egypt" and store.texts("latin") == store.texts()
+    assert store.translation_embeddings("english").shape == (7, 8)
+
+
+def test_local_index_rebuilt_from_store_keeps_version_and_translations(tmp_path, monkeypatch):
+    store = build_store(str(tmp_path / "v.store"), version="20240101T000000Z")
+    index_dir = str(tmp_path / "index")
+    monkeypatch.setattr(sys, "argv", ["search_backend.py", "--store", store.path, "--index-dir", index_dir])
+    search_backend.main()
+    backend = LocalBackend(index_dir)
+    assert backend.version() == "20240101T000000Z"
+    assert backend.languages == ["latin", "english"]
+    # Verse text comes from the index's own memory-mapped store
+    hit = backend.search(store.embeddings[3], limit=1)[0]
+    assert (hit["book"], hit["chapter"], hit["verse"], hit["text"]) == ("Gn", 2, 2, "complevitque Deus")
+    hit = backend.search(store.translation_embeddings("english")[5], limit=1, weights={"english": 1.0})[0]
+    assert hit["text"] == "Ruben"
+    assert backend.bm25_for("english").scores("Reuben").argmax() == 5
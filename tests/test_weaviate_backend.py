@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import numpy as np
+from search_backend import RRF_K, LocalBackend, WeaviateBackend, build_local_index
+from test_local_backend import make_verses
+
+
+class AsyncClient:
+    def __init__(self):
+        self.closed_on = None
+
+    async def close(self):
+        self.closed_on = asyncio.get_running_loop()
+
+
+def test_close_closes_the_async_client_on_its_own_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        backend = WeaviateBackend("http://localhost", "key", "Vulgate")
+        client = backend._async_client = AsyncClient()
+        backend._async_loop = loop
+        backend.close()
+        assert client.closed_on is loop
+        assert backend._async_client is None
+        backend.close()  # a second close (e.g. the atexit hook) is a no-op
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_close_on_a_stopped_loop_runs_it_to_completion():
+    loop = asyncio.new_event_loop()
+    try:
+        backend = WeaviateBackend("http://localhost", "key", "Vulgate")
+        client = backend._async_client = AsyncClient()
+        backend._async_loop = loop
+        backend.close()
+        assert client.closed_on is loop
+    finally:
+        loop.close()
+
+
+def test_rrf_distances_are_on_the_local_backends_scale(tmp_path):
+    df, embeddings = make_verses()
+    build_local_index(df, embeddings, str(tmp_path))
+    local = LocalBackend(str(tmp_path)).hybrid_search("lux", embeddings[9], limit=5, alpha=1.0, fusion="rrf")
+    # Weaviate's ranked fusion scores the verse at rank r of the vector list alpha / (60 + r)
+    response = SimpleNamespace(objects=[
+        SimpleNamespace(properties={k: hit[k] for k in ("book", "chapter", "verse", "text")},
+                        metadata=SimpleNamespace(score=1.0 / (RRF_K + rank)))
+        for rank, hit in enumerate(local, 1)
+    ])
+    hits = WeaviateBackend._hits(response, "rrf")
+    np.testing.assert_allclose([h["distance"] for h in hits], [h["distance"] for h in local], atol=1e-6)
+    assert hits[0]["distance"] == 0.0
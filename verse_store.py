@@ -0,0 +1,192 @@
+import json
+import mmap
+import os
+import numpy as np
+from dotenv import load_dotenv
+from languages import PRIMARY_LANGUAGE
+
+load_dotenv()
+
+VERSE_STORE_PATH = os.getenv("VERSE_STORE_PATH", "data/clem_vulgate.store")
+MAGIC = b"VULGSTO1"
+ALIGN = 64
+
+
+class VerseStore:
+    """Read-only verses and embeddings in one memory-mapped file.
+
+    Layout: an 8-byte magic, the length of a JSON header, the header (book
+    names and the dtype/shape/offset of each array), then the arrays, each
+    aligned to 64 bytes:
+
+    - `book_ids` (uint8), `chapters` and `verses` (uint16), one per verse
+    - `text_offsets` (uint64, n + 1) into `text_bytes` (UTF-8 of all verses)
+    - `embeddings` (float32, n x dim), if any
+    - `chapter_starts` (int32, books x chapters), the first row of each
+      chapter or -1, so a (book, chapter, verse) lookup is one index
+    - per translation (see `main.py --translations`), `text_offsets_<language>`,
+      `text_bytes_<language>` and, if given, `embeddings_<language>`
+
+    The header also records the ingestion version, so an index rebuilt from
+    the store reports the same version as the ingestion that wrote it.
+
+    Nothing is parsed when opening, so worker processes share the same page
+    cache and a verse costs only the pages actually touched.
+    """
+
+    def __init__(self, path=VERSE_STORE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a verse store")
+            header_len = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            header = json.loads(f.read(header_len))
+        base = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+        self.book_names = header["books"]
+        self.book_index = {name: i for i, name in enumerate(self.book_names)}
+        self.version = header.get("version")
+        self.languages = header.get("languages", [])
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._arrays = {}
+        for name, spec in header["arrays"].items():
+            count = int(np.prod(spec["shape"]))
+            array = np.frombuffer(self._mmap, dtype=spec["dtype"], count=count, offset=base + spec["offset"])
+            self._arrays[name] = array.reshape(spec["shape"])
+        for name in ["book_ids", "chapters", "verses", "text_offsets", "text_bytes", "chapter_starts"]:
+            setattr(self, name, self._arrays[name])
+        self.embeddings = self._arrays.get("embeddings")
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    @staticmethod
+    def _encode(texts):
+        """(offsets, UTF-8 bytes) of `texts`."""
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(t) for t in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    @staticmethod
+    def build(path, books, chapters, verses, texts, embeddings=None, translations=None, version=None):
+        """Write a store for verses given in canonical (book, chapter, verse) order.
+
+        `translations` maps a language to its verse texts, or to a (texts,
+        embeddings) pair. The file is written next to `path` and renamed over
+        it, so processes that still map the old file keep a consistent view.
+        """
+        book_names = list(dict.fromkeys(books))
+        book_index = {name: i for i, name in enumerate(book_names)}
+        book_ids = np.fromiter((book_index[b] for b in books), dtype=np.uint8, count=len(books))
+        chapters = np.asarray(chapters, dtype=np.uint16)
+        verses = np.asarray(verses, dtype=np.uint16)
+        text_offsets, text = VerseStore._encode(texts)
+        chapter_starts = np.full((len(book_names), int(chapters.max(initial=0)) + 1), -1, dtype=np.int32)
+        for row in range(len(book_ids) - 1, -1, -1):
+            chapter_starts[book_ids[row], chapters[row]] = row
+        arrays = {
+            "book_ids": book_ids,
+            "chapters": chapters,
+            "verses": verses,
+            "text_offsets": text_offsets,
+            "text_bytes": text,
+            "chapter_starts": chapter_starts,
+        }
+        if embeddings is not None:
+            arrays["embeddings"] = np.ascontiguousarray(embeddings, dtype=np.float32)
+        translations = translations or {}
+        for language, translated in translations.items():
+            translated_texts, translated_embeddings = translated if isinstance(translated, tuple) else (translated, None)
+            arrays[f"text_offsets_{language}"], arrays[f"text_bytes_{language}"] = VerseStore._encode(translated_texts)
+            if translated_embeddings is not None:
+                arrays[f"embeddings_{language}"] = np.ascontiguousarray(translated_embeddings, dtype=np.float32)
+
+        # Offsets are relative to the first aligned byte after the header
+        specs = {}
+        offset = 0
+        for name, a in arrays.items():
+            specs[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+            offset = -(-(offset + a.nbytes) // ALIGN) * ALIGN
+        header = json.dumps({"books": book_names, "arrays": specs, "version": version,
+                             "languages": list(translations)}).encode("utf-8")
+        base = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).astype("<u8").tobytes())
+            f.write(header)
+            for name, a in arrays.items():
+                f.write(b"\0" * (base + specs[name]["offset"] - f.tell()))
+                f.write(a.tobytes())
+        os.replace(tmp, path)
+
+    def _text_arrays(self, language):
+        if language is None or language == PRIMARY_LANGUAGE:
+            return self.text_offsets, self.text_bytes
+        if language not in self.languages:
+            raise KeyError(f"{self.path} has no {language!r} translation")
+        return self._arrays[f"text_offsets_{language}"], self._arrays[f"text_bytes_{language}"]
+
+    def text(self, row, language=None):
+        offsets, text = self._text_arrays(language)
+        start, end = offsets[row], offsets[row + 1]
+        return bytes(text[start:end]).decode("utf-8")
+
+    def texts(self, language=None):
+        offsets, text = self._text_arrays(language)
+        data = bytes(text)
+        return [data[offsets[row]:offsets[row + 1]].decode("utf-8") for row in range(len(self))]
+
+    def translation_embeddings(self, language):
+        """Embeddings of the `language` translation, or None if only its text was stored."""
+        return self._arrays.get(f"embeddings_{language}")
+
+    def books(self):
+        """Book abbreviation of every row."""
+        return np.asarray(self.book_names, dtype=object)[self.book_ids]
+
+    def row(self, row):
+        return {
+            "book": self.book_names[self.book_ids[row]],
+            "chapter": int(self.chapters[row]),
+            "verse": int(self.verses[row]),
+            "text": self.text(row),
+        }
+
+    def _chapter_start(self, book, chapter):
+        b = self.book_index.get(book)
+        if b is None or not 0 <= chapter < self.chapter_starts.shape[1]:
+            return -1
+        return int(self.chapter_starts[b, chapter])
+
+    def lookup(self, book, chapter, verse):
+        """Row of (book, chapter, verse), or None."""
+        start = self._chapter_start(book, chapter)
+        if start < 0:
+            return None
+        # Verses are numbered consecutively from the chapter's first verse in almost every chapter
+        row = start + verse - int(self.verses[start])
+        if start <= row < len(self) and self.book_ids[row] == self.book_ids[start] \
+                and self.chapters[row] == chapter and self.verses[row] == verse:
+            return row
+        end = start
+        while end < len(self) and self.book_ids[end] == self.book_ids[start] and self.chapters[end] == chapter:
+            end += 1
+        i = start + int(np.searchsorted(self.verses[start:end], verse))
+        return i if i < end and self.verses[i] == verse else None
+
+    def get(self, book, chapter, verse):
+        row = self.lookup(book, chapter, verse)
+        return None if row is None else self.row(row)
+
+    def context(self, book, chapter, verse, before=1, after=1):
+        """The verse with up to `before`/`after` neighbours from the same chapter."""
+        row = self.lookup(book, chapter, verse)
+        if row is None:
+            return []
+        rows = range(max(row - before, 0), min(row + after + 1, len(self)))
+        return [self.row(r) for r in rows
+                if self.book_ids[r] == self.book_ids[row] and self.chapters[r] == chapter]